@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+# Microbenchmark: decode cost per message for each supported payload format.
+#
+# Compares the precompiled decoders from "decoder.py" with the previous implementation, which walked
+# the nested "if" chain and looked up the config values from ConfigParser for every message.
+#
+# Usage: python benchmarks/bench_decoder.py [iterations]
+
+import configparser
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+from decoder import EMPTY_SNAPSHOT, PHASES, build_decoder  # noqa: E402
+from payloads import PAYLOADS  # noqa: E402
+
+
+config = configparser.ConfigParser()
+config.read_string(
+    """
+[DEFAULT]
+voltage = 230
+frequency = 50
+
+[PV]
+standby_power = 1
+"""
+)
+
+
+def new_values():
+    values = {"power": -1, "current": 0, "voltage": 0, "forward": 0}
+    for phase in PHASES:
+        values.update({phase + "_power": None, phase + "_current": None, phase + "_voltage": None, phase + "_frequency": None, phase + "_power_factor": None, phase + "_forward": None})
+    return values
+
+
+def legacy_decode(jsonpayload, values):
+    # previous implementation of on_message(), with the globals replaced by the values dict
+    standby_power = float(config["PV"].get("standby_power", "0"))
+    if "pv" in jsonpayload:
+        if isinstance(jsonpayload["pv"], dict):
+            if "power" in jsonpayload["pv"]:
+                pv_power = float(jsonpayload["pv"]["power"])
+                pv_power_above_threshold = pv_power > standby_power
+                pv_power = pv_power if pv_power_above_threshold else 0.0
+                pv_current = float(jsonpayload["pv"]["current"]) if "current" in jsonpayload["pv"] else pv_power / float(config["DEFAULT"]["voltage"])
+                values["current"] = pv_current if pv_power_above_threshold else 0.0
+                values["voltage"] = float(jsonpayload["pv"]["voltage"]) if "voltage" in jsonpayload["pv"] else float(config["DEFAULT"]["voltage"])
+                values["power"] = pv_power
+                if "energy_forward" in jsonpayload["pv"]:
+                    values["forward"] = float(jsonpayload["pv"]["energy_forward"])
+
+                for phase in ("L1", "L2", "L3"):
+                    if phase in jsonpayload["pv"] and "power" in jsonpayload["pv"][phase]:
+                        values[phase + "_power"] = float(jsonpayload["pv"][phase]["power"])
+                        values[phase + "_current"] = (
+                            float(jsonpayload["pv"][phase]["current"]) if "current" in jsonpayload["pv"][phase] else values[phase + "_power"] / float(config["DEFAULT"]["voltage"])
+                        )
+                        values[phase + "_voltage"] = float(jsonpayload["pv"][phase]["voltage"]) if "voltage" in jsonpayload["pv"][phase] else float(config["DEFAULT"]["voltage"])
+                        values[phase + "_frequency"] = float(jsonpayload["pv"][phase]["frequency"]) if "frequency" in jsonpayload["pv"][phase] else float(config["DEFAULT"]["frequency"])
+                        values[phase + "_power_factor"] = float(jsonpayload["pv"][phase]["power_factor"]) if "power_factor" in jsonpayload["pv"][phase] else None
+                        if "energy_forward" in jsonpayload["pv"][phase]:
+                            values[phase + "_forward"] = float(jsonpayload["pv"][phase]["energy_forward"])
+            elif "power_L1" in jsonpayload["pv"]:
+                values["L1_power"] = float(jsonpayload["pv"]["power_L1"])
+                values["L1_voltage"] = float(config["DEFAULT"]["voltage"])
+                values["L1_current"] = values["L1_power"] / float(config["DEFAULT"]["voltage"])
+                values["L1_frequency"] = float(config["DEFAULT"]["frequency"])
+                values["L1_forward"] = None
+            elif "power_L2" in jsonpayload["pv"]:
+                values["L2_power"] = float(jsonpayload["pv"]["power_L2"])
+                values["L2_voltage"] = float(config["DEFAULT"]["voltage"])
+                values["L2_current"] = values["L2_power"] / float(config["DEFAULT"]["voltage"])
+                values["L2_frequency"] = float(config["DEFAULT"]["frequency"])
+                values["L2_forward"] = None
+            elif "power_L3" in jsonpayload["pv"]:
+                values["L3_power"] = float(jsonpayload["pv"]["power_L3"])
+                values["L3_voltage"] = float(config["DEFAULT"]["voltage"])
+                values["L3_current"] = values["L3_power"] / float(config["DEFAULT"]["voltage"])
+                values["L3_frequency"] = float(config["DEFAULT"]["frequency"])
+                values["L3_forward"] = None
+    elif "apower" in jsonpayload:
+        pv_power = float(jsonpayload.get("apower", 0))
+        pv_power_above_threshold = pv_power > standby_power
+        pv_power = pv_power if pv_power_above_threshold else 0.0
+        pv_current = float(jsonpayload.get("current", pv_power / float(config["DEFAULT"]["voltage"])))
+        pv_current = pv_current if pv_power_above_threshold else 0.0
+        pv_voltage = float(jsonpayload.get("voltage", float(config["DEFAULT"]["voltage"])))
+        pv_forward = float(jsonpayload.get("aenergy").get("total")) / 1000 if "aenergy" in jsonpayload and "total" in jsonpayload["aenergy"] else None
+        values.update(power=pv_power, current=pv_current, voltage=pv_voltage, forward=pv_forward)
+        values.update(L1_power=pv_power, L1_current=pv_current, L1_voltage=pv_voltage, L1_forward=pv_forward)
+        values["L1_frequency"] = float(jsonpayload.get("freq", float(config["DEFAULT"]["frequency"])))
+        values["L1_power_factor"] = float(jsonpayload.get("pf")) if "pf" in jsonpayload else None
+        for phase in ("L2", "L3"):
+            values.update({phase + "_power": None, phase + "_current": None, phase + "_voltage": None, phase + "_frequency": None, phase + "_forward": None})
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    decode = build_decoder(voltage=config["DEFAULT"]["voltage"], frequency=config["DEFAULT"]["frequency"], standby_power=config["PV"]["standby_power"])
+
+    print(f"{'format':<20} {'before (us/msg)':>16} {'after (us/msg)':>16} {'speedup':>8}")
+    for name, payload in PAYLOADS.items():
+        jsonpayload = json.loads(payload)
+
+        # both implementations have to produce the same power values
+        values_before = new_values()
+        legacy_decode(jsonpayload, values_before)
+        snapshot = decode(jsonpayload, EMPTY_SNAPSHOT)
+        assert values_before["power"] == (snapshot.power if snapshot.power is not None else -1), name
+        for phase in PHASES:
+            phase_snapshot = getattr(snapshot, phase)
+            assert values_before[phase + "_power"] == (phase_snapshot.power if phase_snapshot is not None else None), name
+
+        before = min(timeit.repeat(lambda: legacy_decode(jsonpayload, values_before), number=iterations, repeat=5)) / iterations * 1e6
+        after = min(timeit.repeat(lambda: decode(jsonpayload, snapshot), number=iterations, repeat=5)) / iterations * 1e6
+        print(f"{name:<20} {before:>16.2f} {after:>16.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
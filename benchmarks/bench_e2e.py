@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+# End-to-end benchmark through the real paho Client, using the broker stand-in from "mqtt_broker.py"
+# on a loopback port, so no external broker is needed.
+#
+# A publisher client sends generic payloads at the given rate. The driver side is a paho Client with
+# the on_message() callback and the Reconnector of the driver, like in "thread" loop mode. Measured:
+#   latency      time from publish() of the publisher until on_message() handed over the snapshot
+#   loss         messages published but never handed over to the device
+#   reconnect    time from a forced disconnect by the broker until the driver is subscribed again
+#
+# Usage: python benchmarks/bench_e2e.py [messages per second] [seconds] [QoS] [MQTT version 3 or 5]
+
+import logging
+import os
+import sys
+import threading
+from time import perf_counter, sleep
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv", "ext"))
+
+import paho.mqtt.client as mqtt  # noqa: E402
+from mqtt_broker import Broker  # noqa: E402
+from pvservice import PvDevice, on_message  # noqa: E402
+from reconnect import Reconnector  # noqa: E402
+
+TOPIC = "bench/pv"
+
+
+class Driver:
+    """MQTT side of the driver, with the same callbacks as "dbus-mqtt-pv.py"."""
+
+    def __init__(self, broker, qos, protocol):
+        self.device = PvDevice(name="bench", instance=100, topic=TOPIC, max_power=5000, position=0, voltage=230, frequency=50, standby_power=0)
+        self.qos = qos
+        self.received = {}
+        self.subscribed = threading.Event()
+
+        self.client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id="bench_driver", userdata={TOPIC: self.device}, protocol=protocol)
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_subscribe = self.on_subscribe
+        self.client.on_message = self.on_message
+        self.reconnector = Reconnector(self.client)
+        self.client.connect(broker.host, broker.port)
+        self.client.loop_start()
+
+    def on_connect(self, client, userdata, flags, reason_code, properties):
+        self.reconnector.connected()
+        client.subscribe(TOPIC, self.qos)
+
+    def on_disconnect(self, client, userdata, flags, reason_code, properties):
+        self.subscribed.clear()
+        self.reconnector.disconnected()
+
+    def on_subscribe(self, client, userdata, mid, reason_code_list, properties):
+        self.subscribed.set()
+
+    def on_message(self, client, userdata, msg):
+        on_message(client, userdata, msg)
+        self.received[msg.payload] = perf_counter()
+
+    def stop(self):
+        self.client.disconnect()
+        self.client.loop_stop()
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(broker, rate, seconds, qos, protocol, disconnect):
+    driver = Driver(broker, qos, protocol)
+    driver.subscribed.wait(5)
+
+    publisher = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id="bench_publisher", protocol=protocol)
+    publisher.connect(broker.host, broker.port)
+    publisher.loop_start()
+
+    sent = {}
+    reconnect_time = None
+    count = int(rate * seconds)
+    start = perf_counter()
+    for i in range(count):
+        # pace the messages by the absolute schedule, so that a slow publish() does not lower the rate
+        wait = start + i / rate - perf_counter()
+        if wait > 0:
+            sleep(wait)
+
+        if disconnect and i == count // 2:
+            broker.disconnect_clients("bench_driver")
+            disconnected = perf_counter()
+
+        payload = b'{"pv": {"power": %i}, "seq": %i}' % (1000 + i % 100, i)
+        sent[payload] = perf_counter()
+        publisher.publish(TOPIC, payload, qos=qos)
+
+        if disconnect and reconnect_time is None and i > count // 2 and driver.subscribed.is_set():
+            reconnect_time = perf_counter() - disconnected
+
+    if disconnect and reconnect_time is None and driver.subscribed.wait(60):
+        reconnect_time = perf_counter() - disconnected
+
+    # wait until the last messages arrived
+    deadline = perf_counter() + 2
+    while len(driver.received) < len(sent) and perf_counter() < deadline:
+        sleep(0.01)
+
+    publisher.disconnect()
+    publisher.loop_stop()
+    driver.stop()
+
+    latencies = sorted(driver.received[payload] - sent[payload] for payload in sent if payload in driver.received)
+    return {
+        "sent": len(sent),
+        "lost": len(sent) - len(latencies),
+        "p50": percentile(latencies, 0.5) * 1000 if latencies else 0,
+        "p99": percentile(latencies, 0.99) * 1000 if latencies else 0,
+        "max": latencies[-1] * 1000 if latencies else 0,
+        "reconnect": reconnect_time,
+    }
+
+
+def main():
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 100
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    qos = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    protocol = mqtt.MQTTv5 if len(sys.argv) > 4 and sys.argv[4] == "5" else mqtt.MQTTv311
+
+    logging.basicConfig(level=logging.WARNING)
+    broker = Broker().start()
+
+    print(f"{rate:.0f} msg/s during {seconds:.0f} s, QoS {qos}, MQTT {'5' if protocol == mqtt.MQTTv5 else '3.1.1'}, broker on port {broker.port}")
+    print(f"{'run':<20} {'sent':>7} {'lost':>6} {'latency p50/p99/max (ms)':>26} {'reconnect (s)':>14}")
+    for name, disconnect in (("steady", False), ("forced disconnect", True)):
+        r = run(broker, rate, seconds, qos, protocol, disconnect)
+        reconnect = f"{r['reconnect']:.3f}" if r["reconnect"] is not None else "-"
+        print(f"{name:<20} {r['sent']:>7} {r['lost']:>6} {r['p50']:>8.2f} /{r['p99']:>7.2f} /{r['max']:>7.2f} {reconnect:>14}")
+
+    broker.stop()
+
+
+if __name__ == "__main__":
+    main()
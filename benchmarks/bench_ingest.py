@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+# Offline benchmark of the ingest policies with a device publishing faster than the D-Bus is
+# updated (default: 50 messages per second, published every second like the timer publish mode).
+# The row "duplicates" shows the skipping of identical payloads without an ingest policy.
+#
+# Reported per policy:
+#   us/msg       time spent in on_message() and the publish cycles, per received message
+#   decoded      messages parsed and decoded
+#   dropped      messages dropped before the JSON was parsed
+#   aggregated   messages decoded, but only handed over as part of an average
+#   skipped      identical payloads, which were not decoded again
+#
+# Usage: python benchmarks/bench_ingest.py [messages] [messages per second]
+
+import os
+import sys
+from time import monotonic, perf_counter
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv", "ext"))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv", "ext", "velib_python"))
+
+import paho.mqtt.client as mqtt  # noqa: E402
+from ingest import AveragePolicy, EveryNthPolicy, LatestPolicy  # noqa: E402
+from memorydbus import MemoryDbusService  # noqa: E402
+from payloads import GENERIC_3P  # noqa: E402
+from pvservice import DbusMqttPvService, PvDevice, get_paths, on_message  # noqa: E402
+from scheduler import ManualScheduler  # noqa: E402
+
+TOPIC = "bench/pv"
+
+
+def run(policy, count, rate, skip_duplicates=False):
+    device = PvDevice(name="bench", instance=100, topic=TOPIC, max_power=5000, position=0, voltage=230, frequency=50, standby_power=1, ingest=policy, skip_duplicates=skip_duplicates)
+    devices = {TOPIC: device}
+    service = DbusMqttPvService(MemoryDbusService("com.victronenergy.pvinverter.mqtt_pv_100", register=False), device, get_paths(device), ManualScheduler(), timeout=0)
+
+    # the messages are ahead of the monotonic clock, so that only the flushes below hand over held messages
+    base = monotonic()
+    messages = []
+    for i in range(count):
+        msg = mqtt.MQTTMessage(topic=TOPIC.encode())
+        msg.payload = GENERIC_3P
+        msg.timestamp = base + i / rate
+        messages.append(msg)
+
+    start = perf_counter()
+    for i, msg in enumerate(messages):
+        on_message(None, devices, msg)
+        if (i + 1) % rate == 0:
+            # like the publish cycle, but with the clock of the messages
+            device.flush(msg.timestamp)
+            service._update()
+    elapsed = perf_counter() - start
+
+    return elapsed / count * 1e6, device
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rate = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    print(f"{count} messages at {rate} msg/s, published every second")
+    print(f"{'policy':<12} {'us/msg':>8} {'decoded':>9} {'dropped':>9} {'aggregated':>11} {'skipped':>9}")
+    for name, policy, skip_duplicates in (
+        ("all", None, False),
+        ("duplicates", None, True),
+        ("latest", LatestPolicy(1.0), False),
+        ("every_nth", EveryNthPolicy(rate), False),
+        ("average", AveragePolicy(1.0), False),
+    ):
+        elapsed, device = run(policy, count, rate, skip_duplicates)
+        if policy is None:
+            print(f"{name:<12} {elapsed:>8.2f} {count - device.duplicates:>9} {0:>9} {0:>11} {device.duplicates:>9}")
+        else:
+            print(f"{name:<12} {elapsed:>8.2f} {policy.decoded:>9} {policy.dropped:>9} {policy.aggregated:>11} {device.duplicates:>9}")
+
+
+if __name__ == "__main__":
+    main()
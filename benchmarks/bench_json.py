@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+# Benchmark: JSON decoding per message with each available JSON backend.
+#
+# The driver uses orjson or ujson, if one of them is installed, else the json module of the standard library.
+#
+# Usage: python benchmarks/bench_json.py [iterations]
+
+import importlib
+import os
+import sys
+import timeit
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+from decoder import JSON_BACKEND  # noqa: E402
+from payloads import GENERIC_3P, SHELLY, TASMOTA_L1  # noqa: E402
+
+PAYLOADS = {
+    "envoy (3-phase)": GENERIC_3P,
+    "shelly pm1:0": SHELLY,
+    "tasmota SENSOR": TASMOTA_L1,
+}
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    backends = {}
+    for name in ("json", "ujson", "orjson"):
+        try:
+            backends[name] = importlib.import_module(name).loads
+        except ImportError:
+            print(f"{name} is not installed")
+
+    print(f"backend used by the driver: {JSON_BACKEND}")
+    print(f"{'payload':<18} {'backend':<8} {'us/msg':>8} {'speedup':>8}")
+    for payload_name, payload in PAYLOADS.items():
+        baseline = None
+        for name, loads in backends.items():
+            # all backends have to return the same result
+            assert loads(payload) == backends["json"](payload), name
+
+            duration = min(timeit.repeat(lambda: loads(payload), number=iterations, repeat=5)) / iterations * 1e6
+            baseline = baseline or duration
+            print(f"{payload_name:<18} {name:<8} {duration:>8.2f} {baseline / duration:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+# Memory and CPU comparison: N devices in one process vs. N separate processes with one device each.
+#
+# Every worker process imports the driver dependencies, creates one MQTT client and one
+# DbusMqttPvService per device and passes the given number of messages through the pipeline of every
+# device, each followed by a publish cycle. If dbus-python is installed (like on a GX device), the
+# services are real VeDbusService on the bus, with a private bus connection per service when a process
+# has more than one device, like the driver. The services are registered as
+# "com.victronenergy.pvinverter.bench_<pid>_<n>", so do not run it while the GUI is used. Otherwise the
+# services run on the in-memory bus from "memorydbus.py" and the bus connections, which the driver would open,
+# are only counted.
+#
+# Usage: python benchmarks/bench_multi_device.py [devices] [messages per device]
+
+import os
+import resource
+import subprocess
+import sys
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv", "ext"))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv", "ext", "velib_python"))
+
+
+def memory_kb():
+    # proportional set size counts shared pages only partially, fall back to RSS if not available
+    for filename, field in (("/proc/self/smaps_rollup", "Pss:"), ("/proc/self/status", "VmRSS:")):
+        try:
+            with open(filename) as f:
+                for line in f:
+                    if line.startswith(field):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def worker(devices, messages):
+    import paho.mqtt.client as mqtt
+    from payloads import SHELLY, jitter
+    from pvservice import DbusMqttPvService, PvDevice, get_paths, handle_message
+    from scheduler import ManualScheduler
+
+    try:
+        import dbus
+        from dbus.mainloop.glib import DBusGMainLoop
+        from vedbus import VeDbusService
+
+        DBusGMainLoop(set_as_default=True)
+
+        def get_dbusservice(servicename):
+            # like "get_bus()" of the driver
+            bus = None
+            if devices > 1:
+                bus = dbus.SessionBus(private=True) if "DBUS_SESSION_BUS_ADDRESS" in os.environ else dbus.SystemBus(private=True)
+            return VeDbusService(servicename, bus=bus, register=False)
+
+        backend = "dbus"
+    except ImportError:
+        from memorydbus import MemoryDbusService
+
+        def get_dbusservice(servicename):
+            return MemoryDbusService(servicename, register=False)
+
+        backend = "memory"
+
+    client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id="bench")
+    scheduler = ManualScheduler()
+    payloads = [jitter(SHELLY, i) for i in range(101)]
+
+    services = []
+    for n in range(devices):
+        device = PvDevice(name="bench", instance=100 + n, topic="bench/pv/%i" % n, max_power=5000, position=0, voltage=230, frequency=50, standby_power=1)
+        dbusservice = get_dbusservice("com.victronenergy.pvinverter.bench_%i_%i" % (os.getpid(), n))
+        services.append(DbusMqttPvService(dbusservice, device, get_paths(device), scheduler, timeout=0))
+
+    for i in range(messages):
+        for service in services:
+            msg = mqtt.MQTTMessage(topic=service.device.topic.encode())
+            msg.payload = payloads[i % len(payloads)]
+            msg.timestamp = i * 0.1
+            handle_message(service.device, msg)
+            service._update()
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # every service has its own bus connection with multiple devices, else the default bus connection is used
+    print(memory_kb(), usage.ru_utime + usage.ru_stime, devices, backend)
+    del client
+
+
+def run_workers(processes, devices, messages):
+    workers = [subprocess.Popen([sys.executable, __file__, "--worker", str(devices), str(messages)], stdout=subprocess.PIPE, text=True) for _ in range(processes)]
+    memory = cpu = connections = 0
+    for process in workers:
+        stdout, _ = process.communicate()
+        worker_memory, worker_cpu, worker_connections, backend = stdout.split()
+        memory += int(worker_memory)
+        cpu += float(worker_cpu)
+        connections += int(worker_connections)
+    return memory, cpu, connections, backend
+
+
+def main():
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    separate_memory, separate_cpu, separate_connections, backend = run_workers(devices, 1, messages)
+    shared_memory, shared_cpu, shared_connections, backend = run_workers(1, devices, messages)
+
+    print(f"{devices} devices, {messages} messages per device, {backend} D-Bus backend")
+    print(f"{'mode':<26} {'memory (kB)':>12} {'CPU (s)':>9} {'bus connections':>16}")
+    print(f"{str(devices) + ' separate processes':<26} {separate_memory:>12} {separate_cpu:>9.2f} {separate_connections:>16}")
+    print(f"{'1 process':<26} {shared_memory:>12} {shared_cpu:>9.2f} {shared_connections:>16}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--worker":
+        worker(int(sys.argv[2]), int(sys.argv[3]))
+    else:
+        main()
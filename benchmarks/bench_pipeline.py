@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+# Offline benchmark of the full pipeline from the received MQTT message to the D-Bus paths.
+#
+# The payloads are fed as paho MQTTMessage through on_message() and published with
+# DbusMqttPvService._update() into a VeDbusService on the in-memory bus from "memorydbus.py", so no
+# broker, no D-Bus daemon and no GLib are needed. Every message is followed by a publish cycle, which is the worst
+# case of the event publish mode. The power, current and voltage of the sample payloads vary per
+# message, so that every publish cycle changes the paths like a real device.
+#
+# Reported per payload format:
+#   msg/s        messages per second through on_message() and _update()
+#   decode p50   median / 99th percentile duration of on_message()
+#   publish      mean / 99th percentile duration of a publish cycle
+#   alloc        peak of the memory allocated while handling one message (tracemalloc)
+#   leak         memory blocks still allocated after all messages, per message
+#   signals      signals per publish cycle, which changed paths
+#   changes      changed paths per ItemsChanged signal
+#
+# The generic 3-phase payload is also run without the Text in the signals ("dbus_signal_text = 0") and
+# with a PropertiesChanged signal for every changed path ("dbus_properties_changed = 1"), the
+# median publish cycles of the three variants, published in turns, are shown below the table.
+# A file with recorded payloads (one JSON payload per line) can be passed as well.
+#
+# Usage: python benchmarks/bench_pipeline.py [messages] [payload file]
+
+import gc
+import logging
+import os
+import sys
+import tracemalloc
+from time import perf_counter, perf_counter_ns
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv", "ext"))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv", "ext", "velib_python"))
+
+import paho.mqtt.client as mqtt  # noqa: E402
+from decoder import JSON_BACKEND  # noqa: E402
+from memorydbus import MemoryDbusService  # noqa: E402
+from payloads import GENERIC_1P, GENERIC_3P, SHELLY, TASMOTA_L1, TASMOTA_L2, TASMOTA_L3, TASMOTA_TOTAL, jitter  # noqa: E402
+from pvservice import DbusMqttPvService, PvDevice, get_paths, on_message  # noqa: E402
+from scheduler import ManualScheduler  # noqa: E402
+
+TOPIC = "bench/pv"
+
+# the payloads are sent in turns, the first one has to contain the total power
+SCENARIOS = {
+    "generic 1-phase": [GENERIC_1P],
+    "generic 3-phase": [GENERIC_3P],
+    "shelly apower": [SHELLY],
+    "tasmota power_L1..3": [TASMOTA_TOTAL, TASMOTA_L1, TASMOTA_L2, TASMOTA_L3],
+}
+
+
+def build_messages(payloads, count, vary=True):
+    messages = []
+    for i in range(count):
+        msg = mqtt.MQTTMessage(topic=TOPIC.encode())
+        msg.payload = jitter(payloads[i % len(payloads)], i // len(payloads)) if vary else payloads[i % len(payloads)]
+        msg.timestamp = i * 0.1
+        messages.append(msg)
+    return messages
+
+
+def build_pipeline(**options):
+    # the same payloads are repeated, which would otherwise be skipped as duplicates
+    device = PvDevice(name="bench", instance=100, topic=TOPIC, max_power=5000, position=0, voltage=230, frequency=50, standby_power=1, skip_duplicates=False)
+    devices = {TOPIC: device}
+    dbusservice = MemoryDbusService("com.victronenergy.pvinverter.mqtt_pv_100", register=False, **options)
+    return device, devices, dbusservice
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(payloads, count, options, vary=True):
+    messages = build_messages(payloads, count, vary)
+
+    device, devices, dbusservice = build_pipeline(**options)
+    for msg in messages[: len(payloads)]:
+        on_message(None, devices, msg)
+    service = DbusMqttPvService(dbusservice, device, get_paths(device), ManualScheduler(), timeout=0)
+
+    # throughput
+    start = perf_counter()
+    for msg in messages:
+        on_message(None, devices, msg)
+        service._update()
+    rate = count / (perf_counter() - start)
+
+    # latency of the single steps
+    decode = []
+    publish = []
+    for msg in messages:
+        t0 = perf_counter_ns()
+        on_message(None, devices, msg)
+        t1 = perf_counter_ns()
+        service._update()
+        t2 = perf_counter_ns()
+        decode.append(t1 - t0)
+        publish.append(t2 - t1)
+    decode.sort()
+    publish.sort()
+
+    # memory, the garbage collector is disabled so that its runs do not distort the numbers
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    blocks = sys.getallocatedblocks()
+    peaks = 0
+    for msg in messages:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        on_message(None, devices, msg)
+        service._update()
+        peaks += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    leaked = sys.getallocatedblocks() - blocks
+    gc.enable()
+
+    return {
+        "rate": rate,
+        "decode_p50": percentile(decode, 0.5) / 1000,
+        "decode_p99": percentile(decode, 0.99) / 1000,
+        "publish_mean": sum(publish) / len(publish) / 1000,
+        "publish_p99": percentile(publish, 0.99) / 1000,
+        "alloc": peaks / count,
+        "leak": leaked / count,
+        "signals": sum(dbusservice.signal_counts.values()) / max(1, dbusservice.signal_counts["ItemsChanged"]),
+        # every PropertiesChanged signal has one change
+        "changes": (dbusservice.changes - dbusservice.signal_counts["PropertiesChanged"]) / max(1, dbusservice.signal_counts["ItemsChanged"]),
+    }
+
+
+def compare(payloads, count, variants):
+    """Return the median publish cycle (us) of every variant of the service options. The variants are
+    published in turns after every message, so that other load on the machine affects all of them alike."""
+    messages = build_messages(payloads, count)
+    pipelines = []
+    for options in variants.values():
+        device, devices, dbusservice = build_pipeline(**options)
+        for msg in messages[: len(payloads)]:
+            on_message(None, devices, msg)
+        pipelines.append((devices, DbusMqttPvService(dbusservice, device, get_paths(device), ManualScheduler(), timeout=0), []))
+
+    for msg in messages:
+        for devices, service, publish in pipelines:
+            on_message(None, devices, msg)
+            t0 = perf_counter_ns()
+            service._update()
+            publish.append(perf_counter_ns() - t0)
+
+    return {name: percentile(sorted(publish), 0.5) / 1000 for name, (devices, service, publish) in zip(variants, pipelines)}
+
+
+def read_payloads(filename):
+    with open(filename, "rb") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    runs = [(name, payloads, {}, True) for name, payloads in SCENARIOS.items()]
+    runs.insert(2, ("generic 3-phase, no Text", SCENARIOS["generic 3-phase"], {"signaltext": False}, True))
+    runs.insert(3, ("generic 3-phase, legacy", SCENARIOS["generic 3-phase"], {"propertieschanged": True}, True))
+    if len(sys.argv) > 2:
+        # the recorded payloads are used as they are
+        runs.append(("recorded " + os.path.basename(sys.argv[2]), read_payloads(sys.argv[2]), {}, False))
+
+    # the errors of invalid recorded payloads would otherwise dominate the timing
+    logging.basicConfig(level=logging.CRITICAL)
+
+    print(f"{count} messages per format, JSON backend: {JSON_BACKEND}, Python {sys.version.split()[0]}")
+    print(f"{'format':<24} {'msg/s':>9} {'decode p50/p99 (us)':>20} {'publish mean/p99 (us)':>22} {'alloc (B/msg)':>14} {'leak (blocks/msg)':>18} {'signals':>8} {'changes':>8}")
+    results = {}
+    for name, payloads, options, vary in runs:
+        r = results[name] = run(payloads, count, options, vary)
+        print(
+            f"{name:<24} {r['rate']:>9.0f} {r['decode_p50']:>9.1f} /{r['decode_p99']:>9.1f} {r['publish_mean']:>10.1f} /{r['publish_p99']:>10.1f}"
+            f" {r['alloc']:>14.0f} {r['leak']:>18.3f} {r['signals']:>8.1f} {r['changes']:>8.1f}"
+        )
+
+    publish = compare(SCENARIOS["generic 3-phase"], count, {"default": {}, "no Text": {"signaltext": False}, "legacy": {"propertieschanged": True}})
+    saved = publish["default"] - publish["no Text"]
+    print(f"\nMedian generic 3-phase publish cycle: {publish['default']:.1f} us, published in turns with the variants below")
+    print(f"Without the Text in the signals: {publish['no Text']:.1f} us ({saved:.1f} us, {saved / publish['default'] * 100:.0f} % less)")
+    print(
+        f"With PropertiesChanged for every path: {publish['legacy']:.1f} us ({publish['legacy'] - publish['default']:.1f} us more),"
+        f" {results['generic 3-phase, legacy']['signals']:.0f} instead of {results['generic 3-phase']['signals']:.0f} signals"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+# Startup latency: time from the process start of the driver until the first valid /Ac/Power is on D-Bus.
+#
+# Run this on the GX device with the driver service stopped ("svc -d /service/dbus-mqtt-pv") and the
+# "config.ini" pointing to the given broker and topic. A retained message is published before every
+# start, so the broker delivers it right after the driver subscribed. Run it once with
+# "wait_for_first_data = 1" and once with "wait_for_first_data = 0" to compare both modes.
+#
+# Usage: python benchmarks/bench_startup.py [broker] [topic] [service name] [runs]
+
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv", "ext"))
+
+import paho.mqtt.publish as publish  # noqa: E402
+from payloads import GENERIC_1P  # noqa: E402
+
+DRIVER = os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv", "dbus-mqtt-pv.py")
+
+
+def get_power(servicename):
+    # returns None as long as the service is not registered or the value is invalid
+    result = subprocess.run(
+        ["dbus-send", "--system", "--print-reply", "--dest=" + servicename, "/Ac/Power", "com.victronenergy.BusItem.GetValue"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    if result.returncode != 0 or "double" not in result.stdout:
+        return None
+    return float(result.stdout.split("double")[1].split()[0])
+
+
+def measure(servicename, timeout=120):
+    start = time.monotonic()
+    driver = subprocess.Popen([sys.executable, DRIVER], cwd=os.path.dirname(DRIVER), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.monotonic() - start < timeout:
+            if get_power(servicename) is not None:
+                return time.monotonic() - start
+            time.sleep(0.01)
+        return None
+    finally:
+        driver.terminate()
+        driver.wait()
+
+
+def main():
+    broker = sys.argv[1] if len(sys.argv) > 1 else "localhost"
+    topic = sys.argv[2] if len(sys.argv) > 2 else "enphase/envoy-s/meters"
+    servicename = sys.argv[3] if len(sys.argv) > 3 else "com.victronenergy.pvinverter.mqtt_pv_100"
+    runs = int(sys.argv[4]) if len(sys.argv) > 4 else 5
+
+    latencies = []
+    for run in range(runs):
+        publish.single(topic, GENERIC_1P, retain=True, hostname=broker)
+        latency = measure(servicename)
+        print(f"run {run + 1}: " + (f"{latency:.3f} s" if latency is not None else "timeout"))
+        if latency is not None:
+            latencies.append(latency)
+
+    # remove the retained message again
+    publish.single(topic, None, retain=True, hostname=broker)
+
+    if latencies:
+        latencies.sort()
+        print(f"min {latencies[0]:.3f} s, median {latencies[len(latencies) // 2]:.3f} s, max {latencies[-1]:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+
+# Microbenchmark: cost of adding a sample to the rolling window statistics for different window
+# lengths, which should be the same for all windows.
+#
+# Usage: python benchmarks/bench_stats.py [samples]
+
+import os
+import random
+import sys
+from time import perf_counter
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+from stats import RollingStats, get_window_name  # noqa: E402
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    # power values of a 10 Hz publisher, the memory of the windows does not depend on the rate
+    samples = [(i * 0.1, random.uniform(0, 5000)) for i in range(count)]
+
+    print(f"{count} samples at 10 Hz")
+    print(f"{'window':<8} {'us/sample':>10}")
+    for window in (60, 900, 3600):
+        stats = RollingStats(window)
+        start = perf_counter()
+        for time, value in samples:
+            stats.add(time, value)
+            stats.min, stats.max, stats.avg, stats.stddev
+        print(f"{get_window_name(window):<8} {(perf_counter() - start) / count * 1e6:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+# Microbenchmark: wrapping the published values for D-Bus with wrap_dbus_value(), which checks the type
+# of every value, against the wrappers of the declared path types from get_dbus_wrapper().
+#
+# Run it on the GX device or a Linux box with dbus-python installed for real numbers. Without dbus-python the
+# types of the in-memory stand-in from "memorydbus.py" are used, which are plain Python subclasses.
+#
+# Usage: python benchmarks/bench_wrap.py [values]
+
+import os
+import sys
+from timeit import timeit
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv", "ext", "velib_python"))
+
+from memorydbus import install_dbus_types  # noqa: E402
+
+install_dbus_types()
+
+import dbus  # noqa: E402
+from ve_utils import get_dbus_wrapper, wrap_dbus_value  # noqa: E402
+
+# like the values of a publish cycle
+VALUES = {
+    "float": (float, [1234.56, 230.12, 5.37, None]),
+    "int": (int, [0, 7, 255, 8]),
+    "str": (str, ["MQTT connected", "MQTT reconnecting"]),
+}
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    print(f"{count} values per type, dbus types from {'the in-memory stand-in' if dbus.__spec__ is None else dbus.__file__}")
+    print(f"{'type':<8} {'wrap_dbus_value (ns)':>21} {'declared type (ns)':>19} {'speedup':>8}")
+    for name, (valuetype, values) in VALUES.items():
+        wrap = get_dbus_wrapper(valuetype)
+        repeat = count // len(values)
+
+        # the wrapped values have to be equal
+        assert [wrap(value) for value in values] == [wrap_dbus_value(value) for value in values]
+
+        generic = timeit(lambda: [wrap_dbus_value(value) for value in values], number=repeat) / (repeat * len(values)) * 1e9
+        typed = timeit(lambda: [wrap(value) for value in values], number=repeat) / (repeat * len(values)) * 1e9
+        print(f"{name:<8} {generic:>21.1f} {typed:>19.1f} {generic / typed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+# Measure the D-Bus signals per second emitted by a running driver and the CPU usage of the dbus-daemon.
+#
+# Run this on the GX device while the driver is running, once with "dbus_properties_changed = 1" and once
+# with "dbus_properties_changed = 0" in the "config.ini" to compare the legacy per path signals with the
+# batched ItemsChanged signal. Note that dbus-monitor itself adds some load to the dbus-daemon, which is
+# the same for both measurements.
+#
+# Usage: python measure_dbus_signals.py [service name] [seconds]
+
+import os
+import subprocess
+import sys
+import time
+
+
+def get_name_owner(servicename):
+    output = subprocess.check_output(
+        ["dbus-send", "--system", "--print-reply", "--dest=org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus.GetNameOwner", "string:" + servicename],
+        text=True,
+    )
+    return output.split('"')[1]
+
+
+def get_dbus_daemon_pid():
+    for pid in os.listdir("/proc"):
+        if pid.isdigit():
+            try:
+                with open(f"/proc/{pid}/comm") as f:
+                    if f.read().strip() == "dbus-daemon":
+                        return int(pid)
+            except OSError:
+                pass
+    raise RuntimeError("dbus-daemon not found")
+
+
+def get_cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime and stime are the fields 14 and 15, counted from the pid
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def main():
+    servicename = sys.argv[1] if len(sys.argv) > 1 else "com.victronenergy.pvinverter.mqtt_pv_100"
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+
+    owner = get_name_owner(servicename)
+    daemon_pid = get_dbus_daemon_pid()
+
+    monitor = subprocess.Popen(["dbus-monitor", "--system", f"type='signal',sender='{owner}'"], stdout=subprocess.PIPE, text=True)
+    cpu_start = get_cpu_seconds(daemon_pid)
+    start = time.monotonic()
+
+    signals = {}
+    try:
+        for line in monitor.stdout:
+            if line.startswith("signal "):
+                member = line.split("member=")[1].split()[0]
+                signals[member] = signals.get(member, 0) + 1
+            if time.monotonic() - start >= seconds:
+                break
+    finally:
+        monitor.terminate()
+
+    elapsed = time.monotonic() - start
+    cpu = get_cpu_seconds(daemon_pid) - cpu_start
+
+    print(f"{servicename} ({owner}) during {elapsed:.0f} s")
+    for member, count in sorted(signals.items()):
+        print(f"  {member:<20} {count / elapsed:>8.1f} signals/s")
+    print(f"  {'total':<20} {sum(signals.values()) / elapsed:>8.1f} signals/s")
+    print(f"dbus-daemon CPU: {cpu / elapsed * 100:.2f} %")
+
+
+if __name__ == "__main__":
+    main()
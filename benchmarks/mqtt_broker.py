@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+
+# Minimal MQTT 3.1.1 / 5 broker stand-in for the benchmarks, so that the real paho Client can be
+# driven without an external broker like Mosquitto.
+#
+# Supported: CONNECT, SUBSCRIBE (with wildcards), UNSUBSCRIBE, PUBLISH with QoS 0/1/2 in both
+# directions, retained messages, PINGREQ and DISCONNECT. Sessions are never persisted, messages
+# are not retransmitted and the MQTT 5 properties are ignored. Clients can be disconnected by the
+# broker with disconnect_clients(), to test reconnects.
+#
+# Usage: python benchmarks/mqtt_broker.py [port]
+
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv", "ext"))
+
+from paho.mqtt.client import topic_matches_sub  # noqa: E402
+
+CONNECT = 0x10
+CONNACK = 0x20
+PUBLISH = 0x30
+PUBACK = 0x40
+PUBREC = 0x50
+PUBREL = 0x60
+PUBCOMP = 0x70
+SUBSCRIBE = 0x80
+SUBACK = 0x90
+UNSUBSCRIBE = 0xA0
+UNSUBACK = 0xB0
+PINGREQ = 0xC0
+PINGRESP = 0xD0
+DISCONNECT = 0xE0
+
+MQTTv5 = 5
+
+
+def encode_length(length):
+    data = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        data.append(byte | 0x80 if length > 0 else byte)
+        if length == 0:
+            return bytes(data)
+
+
+def encode_string(value):
+    return struct.pack("!H", len(value)) + value
+
+
+def packet(header, body=b""):
+    return bytes((header,)) + encode_length(len(body)) + body
+
+
+class Reader:
+    """Reads the fields of a packet body."""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def remaining(self):
+        return len(self.data) - self.pos
+
+    def byte(self):
+        self.pos += 1
+        return self.data[self.pos - 1]
+
+    def uint16(self):
+        self.pos += 2
+        return struct.unpack_from("!H", self.data, self.pos - 2)[0]
+
+    def varint(self):
+        value = 0
+        multiplier = 1
+        while True:
+            byte = self.byte()
+            value += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                return value
+            multiplier *= 128
+
+    def string(self):
+        length = self.uint16()
+        self.pos += length
+        return self.data[self.pos - length : self.pos]
+
+    def skip_properties(self):
+        # read the length before the position is used, since reading it moves the position
+        length = self.varint()
+        self.pos += length
+
+    def rest(self):
+        return self.data[self.pos :]
+
+
+class Session:
+    """Connection of one client."""
+
+    def __init__(self, broker, sock, address):
+        self.broker = broker
+        self.sock = sock
+        self.address = address
+        self.client_id = None
+        self.protocol = 4
+        self.subscriptions = {}
+        self._lock = threading.Lock()
+        self._packet_id = 0
+        # packet ids of received QoS 2 messages, which are waiting for the PUBREL
+        self._received_qos2 = set()
+
+    def send(self, data):
+        with self._lock:
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                pass
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def next_packet_id(self):
+        with self._lock:
+            self._packet_id = self._packet_id % 65535 + 1
+            return self._packet_id
+
+    def deliver(self, topic, payload, qos, retain):
+        body = encode_string(topic)
+        if qos > 0:
+            body += struct.pack("!H", self.next_packet_id())
+        if self.protocol == MQTTv5:
+            body += b"\x00"
+        self.send(packet(PUBLISH | (qos << 1) | (1 if retain else 0), body + payload))
+
+    def _read_exactly(self, length):
+        data = bytearray()
+        while len(data) < length:
+            chunk = self.sock.recv(length - len(data))
+            if not chunk:
+                raise ConnectionError("connection closed")
+            data += chunk
+        return bytes(data)
+
+    def _read_packet(self):
+        header = self._read_exactly(1)[0]
+        length = 0
+        multiplier = 1
+        while True:
+            byte = self._read_exactly(1)[0]
+            length += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+        return header, self._read_exactly(length) if length else b""
+
+    def run(self):
+        try:
+            while True:
+                header, body = self._read_packet()
+                if not self._handle(header, Reader(body)):
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.broker._remove(self)
+            self.close()
+
+    def _handle(self, header, reader):
+        packet_type = header & 0xF0
+
+        if packet_type == CONNECT:
+            reader.string()  # protocol name
+            self.protocol = reader.byte()
+            reader.byte()  # connect flags, will and credentials are ignored
+            reader.uint16()  # keep alive
+            if self.protocol == MQTTv5:
+                reader.skip_properties()
+            self.client_id = reader.string().decode()
+            self.send(packet(CONNACK, b"\x00\x00\x00" if self.protocol == MQTTv5 else b"\x00\x00"))
+
+        elif packet_type == PUBLISH:
+            qos = (header >> 1) & 0x03
+            retain = bool(header & 0x01)
+            topic = reader.string()
+            packet_id = reader.uint16() if qos > 0 else None
+            if self.protocol == MQTTv5:
+                reader.skip_properties()
+            payload = reader.rest()
+
+            if qos == 1:
+                self.send(packet(PUBACK, struct.pack("!H", packet_id)))
+            elif qos == 2:
+                self.send(packet(PUBREC, struct.pack("!H", packet_id)))
+                # a duplicate of a QoS 2 message is not delivered again
+                if packet_id in self._received_qos2:
+                    return True
+                self._received_qos2.add(packet_id)
+            self.broker.publish(topic, payload, qos, retain)
+
+        elif packet_type == PUBREL:
+            packet_id = reader.uint16()
+            self._received_qos2.discard(packet_id)
+            self.send(packet(PUBCOMP, struct.pack("!H", packet_id)))
+
+        elif packet_type == PUBREC:
+            # second step of a QoS 2 message sent to the client
+            self.send(packet(PUBREL | 0x02, struct.pack("!H", reader.uint16())))
+
+        elif packet_type in (PUBACK, PUBCOMP):
+            pass
+
+        elif packet_type == SUBSCRIBE:
+            packet_id = reader.uint16()
+            if self.protocol == MQTTv5:
+                reader.skip_properties()
+            granted = bytearray()
+            topics = []
+            while reader.remaining():
+                topic = reader.string()
+                qos = reader.byte() & 0x03
+                self.subscriptions[topic] = qos
+                granted.append(qos)
+                topics.append((topic, qos))
+            properties = b"\x00" if self.protocol == MQTTv5 else b""
+            self.send(packet(SUBACK, struct.pack("!H", packet_id) + properties + bytes(granted)))
+            for topic, qos in topics:
+                self.broker._send_retained(self, topic, qos)
+
+        elif packet_type == UNSUBSCRIBE:
+            packet_id = reader.uint16()
+            if self.protocol == MQTTv5:
+                reader.skip_properties()
+            count = 0
+            while reader.remaining():
+                self.subscriptions.pop(reader.string(), None)
+                count += 1
+            properties = b"\x00" + b"\x00" * count if self.protocol == MQTTv5 else b""
+            self.send(packet(UNSUBACK, struct.pack("!H", packet_id) + properties))
+
+        elif packet_type == PINGREQ:
+            self.send(packet(PINGRESP))
+
+        elif packet_type == DISCONNECT:
+            return False
+
+        return True
+
+
+class Broker:
+    """MQTT broker stand-in listening on the loopback interface."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self.host, self.port = self._server.getsockname()
+        self._sessions = []
+        self._retained = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.received = 0
+        self.delivered = 0
+
+    def start(self):
+        self._server.listen()
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+        logging.info("MQTT broker: Listening on %s:%i" % (self.host, self.port))
+        return self
+
+    def stop(self):
+        self._server.close()
+        self.disconnect_clients()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, address = self._server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = Session(self, sock, address)
+            with self._lock:
+                self._sessions.append(session)
+            threading.Thread(target=session.run, daemon=True).start()
+
+    def _remove(self, session):
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+
+    def _send_retained(self, session, subscription, qos):
+        with self._lock:
+            retained = list(self._retained.items())
+        for topic, (payload, retained_qos) in retained:
+            if topic_matches_sub(subscription.decode(), topic.decode()):
+                session.deliver(topic, payload, min(qos, retained_qos), True)
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        """Deliver a message to all subscribed clients, like it was published by a client."""
+        if isinstance(topic, str):
+            topic = topic.encode()
+        with self._lock:
+            self.received += 1
+            if retain:
+                if payload:
+                    self._retained[topic] = (payload, qos)
+                else:
+                    self._retained.pop(topic, None)
+            sessions = list(self._sessions)
+
+        decoded_topic = topic.decode()
+        for session in sessions:
+            for subscription, subscription_qos in list(session.subscriptions.items()):
+                if topic_matches_sub(subscription.decode(), decoded_topic):
+                    session.deliver(topic, payload, min(qos, subscription_qos), False)
+                    self.delivered += 1
+                    break
+
+    def disconnect_clients(self, client_id=None):
+        """Close the connection of the client with the given id, or of all clients. Returns the number of closed connections."""
+        with self._lock:
+            sessions = [session for session in self._sessions if client_id is None or session.client_id == client_id]
+        for session in sessions:
+            session.close()
+        return len(sessions)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    broker = Broker(port=int(sys.argv[1]) if len(sys.argv) > 1 else 1883).start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        broker.stop()
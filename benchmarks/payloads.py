@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+# Sample payloads used by the benchmarks, as published by real devices.
+
+import json
+
+# values changed by jitter()
+JITTER_KEYS = ("power", "current", "voltage", "apower", "power_L1", "power_L2", "power_L3")
+
+# generic payload with total power only
+GENERIC_1P = b'{"pv": {"power": 1234.5}}'
+
+# generic payload with all three phases, like the Enphase Envoy
+GENERIC_3P = (
+    b'{"pv": {"power": 4321.0, "voltage": 231.2, "current": 18.7, "energy_forward": 12345.67,'
+    b' "L1": {"power": 1440.3, "voltage": 231.0, "current": 6.2, "frequency": 50.01, "power_factor": 0.99, "energy_forward": 4115.2},'
+    b' "L2": {"power": 1441.1, "voltage": 231.4, "current": 6.2, "frequency": 50.01, "power_factor": 0.98, "energy_forward": 4114.9},'
+    b' "L3": {"power": 1439.6, "voltage": 231.2, "current": 6.3, "frequency": 50.01, "power_factor": 0.99, "energy_forward": 4115.5}}}'
+)
+
+# Shelly Gen2+ "status/pm1:0"
+SHELLY = (
+    b'{"id": 0, "voltage": 231.4, "current": 2.712, "apower": 612.3, "freq": 50.0, "pf": 0.97,'
+    b' "aenergy": {"total": 153283.172, "by_minute": [10213.421, 10180.773, 10199.211], "minute_ts": 1729160400},'
+    b' "ret_aenergy": {"total": 0.000, "by_minute": [0.000, 0.000, 0.000], "minute_ts": 1729160400}}'
+)
+
+# Tasmota SML "SENSOR", the phases are sent in separate messages
+TASMOTA_TOTAL = b'{"Time": "2023-11-22T21:57:13", "pv": {"power": 413}}'
+TASMOTA_L1 = b'{"Time": "2023-11-22T21:57:13", "pv": {"power_L1": 94}}'
+TASMOTA_L2 = b'{"Time": "2023-11-22T21:57:13", "pv": {"power_L2": 160}}'
+TASMOTA_L3 = b'{"Time": "2023-11-22T21:57:13", "pv": {"power_L3": 159}}'
+
+PAYLOADS = {
+    "generic 1-phase": GENERIC_1P,
+    "generic 3-phase": GENERIC_3P,
+    "shelly apower": SHELLY,
+    "tasmota power_L1": TASMOTA_L1,
+}
+
+
+def jitter(payload, i):
+    """Return the payload with the power, current and voltage changed by up to 5 %, which repeats every 101 values of ``i``."""
+    factor = 1 + ((i * 37) % 101 - 50) / 1000
+
+    def vary(values):
+        for key, value in values.items():
+            if isinstance(value, dict):
+                vary(value)
+            elif key in JITTER_KEYS and isinstance(value, (int, float)):
+                values[key] = round(value * factor, 3)
+        return values
+
+    return json.dumps(vary(json.loads(payload))).encode()
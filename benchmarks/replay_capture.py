@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+# Replay the MQTT messages captured with "capture_file" in the "config.ini" through on_message().
+#
+# The values are published after every message into a VeDbusService on the in-memory bus from
+# "memorydbus.py", so no broker, no D-Bus daemon and no GLib are needed. The devices are taken from
+# the given "config.ini", else one device with the default settings is created for every captured
+# topic. Pass the rotated capture files from the oldest to the newest. To profile the driver at production message rates, run:
+#   python -m cProfile -s cumtime benchmarks/replay_capture.py --speed 1 capture.bin
+#
+# Usage: python benchmarks/replay_capture.py [--speed N] [--config config.ini] [--show] file [file ...]
+
+import argparse
+import configparser
+import logging
+import os
+import sys
+from time import perf_counter
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv", "ext"))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv", "ext", "velib_python"))
+
+from capture import read_capture, replay  # noqa: E402
+from decoder import PHASES  # noqa: E402
+from memorydbus import MemoryDbusService  # noqa: E402
+from pvservice import DbusMqttPvService, PvDevice, get_devices, get_paths, on_message  # noqa: E402
+from scheduler import ManualScheduler  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured MQTT messages through on_message()")
+    parser.add_argument("files", nargs="+", help="capture files, from the oldest to the newest")
+    parser.add_argument("--speed", type=float, default=0, help="1 = captured timing, N = N times faster, 0 = as fast as possible (default)")
+    parser.add_argument("--config", help="config.ini with the device settings")
+    parser.add_argument("--show", action="store_true", help="print the published power values after every message")
+    parser.add_argument("--logging", default="WARNING", help="logging level of the driver (default: WARNING)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.logging)
+
+    messages = [msg for filename in args.files for msg in read_capture(filename)]
+    if not messages:
+        print("No messages captured")
+        return
+
+    if args.config:
+        config = configparser.ConfigParser()
+        config.read(args.config)
+        device_list = get_devices(config)
+    else:
+        topics = list(dict.fromkeys(msg.topic for msg in messages))
+        device_list = [PvDevice(name=topic, instance=100 + i, topic=topic, max_power=0, position=0, voltage=230, frequency=50, standby_power=0) for i, topic in enumerate(topics)]
+    devices = {device.topic: device for device in device_list}
+
+    # the services are created before the first message, like with "wait_for_first_data = 0"
+    services = {}
+    for device in device_list:
+        dbusservice = MemoryDbusService("com.victronenergy.pvinverter.mqtt_pv_" + str(device.instance), register=False)
+        services[device.topic] = (DbusMqttPvService(dbusservice, device, get_paths(device), ManualScheduler(), timeout=0), dbusservice)
+
+    def on_message_published(client, userdata, msg):
+        on_message(client, userdata, msg)
+        if msg.topic in services:
+            service, dbusservice = services[msg.topic]
+            service._update()
+            if args.show:
+                phases = " ".join(f"{phase}: {dbusservice['/Ac/' + phase + '/Power']}" for phase in PHASES)
+                print(f"{msg.timestamp:.3f} {msg.topic}: {dbusservice['/Ac/Power']} W - {phases}")
+
+    start = perf_counter()
+    count = replay(messages, on_message_published, userdata=devices, speed=args.speed)
+    elapsed = perf_counter() - start
+
+    print(f"{count} messages in {elapsed:.3f} s ({count / elapsed:.0f} msg/s), captured during {messages[-1].timestamp - messages[0].timestamp:.3f} s")
+    for topic, (service, dbusservice) in services.items():
+        print(f"{topic}: {dbusservice.signal_counts['ItemsChanged']} ItemsChanged signals with {dbusservice.changes} changes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+
+# Stand-in for the GLib scheduler, so that the pipeline from "pvservice.py" can run without a
+# GLib.MainLoop(), like on a plain Linux box.
+
+
+class ManualScheduler:
+    """Replaces the GLib module as scheduler. Callbacks are only collected and run by the caller."""
+
+    def __init__(self):
+        self.timeouts = []
+        self.idle = []
+
+    def timeout_add(self, milliseconds, callback):
+        self.timeouts.append((milliseconds, callback))
+
+    def idle_add(self, callback):
+        self.idle.append(callback)
+
+    def run_idle(self):
+        idle, self.idle = self.idle, []
+        for callback in idle:
+            callback()
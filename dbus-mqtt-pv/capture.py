@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+# Capture of the received MQTT messages and replay of the captured messages.
+#
+# Every message is appended as one record to the capture file:
+#   header: payload length (uint32), timestamp (double), QoS (uint8), retain (uint8), topic length (uint16)
+#   topic (UTF-8) and payload (raw bytes)
+# All values are little endian. The timestamp is the message.timestamp set by paho on receipt, which
+# is a monotonic time, so only the difference between two messages is meaningful.
+#
+# If the file exceeds the maximum size, it is renamed to "<file>.1" (the older files to "<file>.2"
+# and so on) and a new file is started. Replay the files from the highest to the lowest number.
+
+import logging
+import os
+import struct
+from time import monotonic, sleep
+
+import paho.mqtt.client as mqtt
+
+HEADER = struct.Struct("<IdBBH")
+
+
+class CaptureWriter:
+    """Appends the received MQTT messages to a capture file, which is rotated by size."""
+
+    def __init__(self, filename, max_size=10 * 1024 * 1024, backups=3):
+        self.filename = filename
+        self.max_size = max_size
+        self.backups = backups
+        self._file = None
+        self._size = 0
+        self._open()
+
+    def _open(self):
+        # unbuffered, so that no message is lost, if the driver is killed
+        self._file = open(self.filename, "ab", buffering=0)
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        self._file.close()
+        for number in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.filename}.{number}"):
+                os.replace(f"{self.filename}.{number}", f"{self.filename}.{number + 1}")
+        if self.backups > 0:
+            os.replace(self.filename, self.filename + ".1")
+        else:
+            os.remove(self.filename)
+        logging.info('Capture file "%s" rotated' % self.filename)
+        self._open()
+
+    def write(self, msg):
+        topic = msg._topic if isinstance(msg._topic, bytes) else msg._topic.encode()
+        payload = msg.payload if isinstance(msg.payload, bytes) else bytes(msg.payload)
+        record = HEADER.pack(len(payload), msg.timestamp, msg.qos, 1 if msg.retain else 0, len(topic)) + topic + payload
+
+        if self._size > 0 and self._size + len(record) > self.max_size:
+            self._rotate()
+
+        self._file.write(record)
+        self._size += len(record)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def wrap(self, on_message):
+        """Return an on_message callback, which captures the message before it is passed to ``on_message``."""
+
+        def on_message_captured(client, userdata, msg):
+            try:
+                self.write(msg)
+            except OSError as e:
+                logging.error("Capture of MQTT message failed: %s" % e)
+            on_message(client, userdata, msg)
+
+        return on_message_captured
+
+
+def read_capture(filename):
+    """Yield the captured messages of a capture file as paho MQTTMessage.
+
+    A truncated last record, like after a power loss, is ignored.
+    """
+    with open(filename, "rb") as f:
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            payload_length, timestamp, qos, retain, topic_length = HEADER.unpack(header)
+            data = f.read(topic_length + payload_length)
+            if len(data) < topic_length + payload_length:
+                logging.warning('Capture file "%s" ends with a truncated record' % filename)
+                return
+
+            msg = mqtt.MQTTMessage(topic=data[:topic_length])
+            msg.payload = data[topic_length:]
+            msg.timestamp = timestamp
+            msg.qos = qos
+            msg.retain = bool(retain)
+            yield msg
+
+
+def replay(messages, on_message, userdata=None, speed=1.0, client=None):
+    """Pass the captured messages to ``on_message``.
+
+    :param messages: MQTTMessage objects in the order they were received, like from ``read_capture()``
+    :param speed: ``1`` replays with the captured timing, ``N`` N times faster and ``0`` as fast as possible
+    :returns: the number of replayed messages
+    """
+    count = 0
+    start = None
+    for msg in messages:
+        if speed > 0:
+            if start is None:
+                start = monotonic()
+                first = msg.timestamp
+            wait = (msg.timestamp - first) / speed - (monotonic() - start)
+            if wait > 0:
+                sleep(wait)
+        on_message(client, userdata, msg)
+        count += 1
+    return count
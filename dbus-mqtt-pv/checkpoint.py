@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+# Checkpoints of the driver state (the calculated energy of the devices), which survive a restart.
+#
+# The GX devices store /data on eMMC or SD cards, so the checkpoint is written at most once per
+# interval and on a clean shutdown. Every write goes to a temporary file, which replaces the
+# checkpoint only after it was synced, so a power loss leaves either the old or the new checkpoint.
+#
+# File format (JSON): {"version": 1, "devices": {"<topic>": {"total": kWh, "L1": kWh, ...}}}
+
+import json
+import logging
+import math
+import os
+from time import monotonic
+
+from decoder import PHASES, PhaseSnapshot, PvSnapshot
+
+VERSION = 1
+CHANNELS = ("total",) + PHASES
+
+
+def get_state(snapshot, restored=None):
+    """Return the energy values of a snapshot, which are saved in the checkpoint.
+
+    Channels of ``restored``, which were not received yet, are kept, so that a save before the first
+    data does not lose them.
+    """
+    state = dict(restored) if restored else {}
+    for channel, value in zip(CHANNELS, (snapshot, snapshot.L1, snapshot.L2, snapshot.L3)):
+        if value is not None and value.forward is not None:
+            state[channel] = value.forward
+    return state
+
+
+def restore_snapshot(snapshot, restored, topic):
+    """Return the snapshot with the energy values from the checkpoint.
+
+    Only channels, which were received in this snapshot and start at zero (like the calculated energy
+    after a restart), are restored. If the device sends its own energy, it is kept. The restored
+    channels are removed from ``restored``.
+    """
+    values = [snapshot, snapshot.L1, snapshot.L2, snapshot.L3]
+    for i, channel in enumerate(CHANNELS):
+        if channel not in restored or values[i] is None or values[i].forward is None:
+            continue
+        value = restored.pop(channel)
+        if values[i].forward != 0.0:
+            if values[i].forward < value:
+                logging.warning('Checkpoint: Energy %s of "%s" is %.3f kWh, which is less than the saved %.3f kWh. The counter of the device was reset' % (channel, topic, values[i].forward, value))
+            continue
+        if i == 0:
+            values[0] = PvSnapshot(snapshot.power, snapshot.current, snapshot.voltage, value, snapshot.L1, snapshot.L2, snapshot.L3, snapshot.time, snapshot.device_time)
+        else:
+            phase = values[i]
+            values[i] = PhaseSnapshot(phase.power, phase.current, phase.voltage, phase.frequency, phase.power_factor, value, phase.time)
+        logging.info('Checkpoint: Energy %s of "%s" restored to %.3f kWh' % (channel, topic, value))
+
+    return PvSnapshot(values[0].power, values[0].current, values[0].voltage, values[0].forward, values[1], values[2], values[3], values[0].time, snapshot.device_time)
+
+
+class Checkpoint:
+    def __init__(self, filename, interval=900):
+        """
+        :param filename: path of the checkpoint file
+        :param interval: minimum seconds between two writes, except for the write on shutdown
+        """
+        self.filename = filename
+        self.interval = interval
+        self._saved = None
+        self._saved_time = monotonic()
+
+        # to check the wear of the storage
+        self.writes = 0
+        self.bytes_written = 0
+
+    def load(self):
+        """Return the saved state as dict ``{topic: {channel: kWh}}``. Invalid values are dropped."""
+        try:
+            with open(self.filename) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.error('Checkpoint: "%s" could not be read and is ignored: %s' % (self.filename, e))
+            return {}
+
+        if not isinstance(data, dict) or data.get("version") != VERSION or not isinstance(data.get("devices"), dict):
+            logging.error('Checkpoint: "%s" has an unknown format and is ignored' % self.filename)
+            return {}
+
+        devices = {}
+        for topic, state in data["devices"].items():
+            if isinstance(state, dict):
+                devices[topic] = {
+                    channel: float(value) for channel, value in state.items() if channel in CHANNELS and isinstance(value, (int, float)) and math.isfinite(value) and value >= 0
+                }
+
+        self._saved = devices
+        return devices
+
+    def save(self, devices, force=False):
+        """Write the state ``{topic: {channel: kWh}}``, if it changed and the interval passed or ``force`` is set.
+
+        Topics and channels missing in ``devices`` keep their saved values.
+        """
+        now = monotonic()
+        if self._saved:
+            merged = {topic: dict(state) for topic, state in self._saved.items()}
+            for topic, state in devices.items():
+                merged.setdefault(topic, {}).update(state)
+            devices = merged
+        if devices == self._saved or (not force and now - self._saved_time < self.interval):
+            return False
+
+        data = json.dumps({"version": VERSION, "devices": devices}, separators=(",", ":"))
+        temp = self.filename + ".tmp"
+        try:
+            with open(temp, "w") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, self.filename)
+
+            # make the rename itself persistent
+            directory = os.open(os.path.dirname(os.path.abspath(self.filename)), os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+        except OSError as e:
+            logging.error('Checkpoint: "%s" could not be written: %s' % (self.filename, e))
+            return False
+
+        self._saved = devices
+        self._saved_time = now
+        self.writes += 1
+        self.bytes_written += len(data)
+        logging.info("Checkpoint: Saved, %i writes with %i bytes since the start" % (self.writes, self.bytes_written))
+        return True
@@ -1,14 +1,15 @@
 #!/usr/bin/env python
 
 from gi.repository import GLib  # pyright: ignore[reportMissingImports]
-import platform
 import logging
 import sys
 import os
-from time import sleep, time
-import json
+from time import monotonic, sleep
 import configparser  # for config/ini file
 import _thread
+import atexit
+import signal
+import dbus  # pyright: ignore[reportMissingImports]
 
 # import external packages
 sys.path.insert(1, os.path.join(os.path.dirname(__file__), "ext"))
@@ -19,6 +20,17 @@ sys.path.insert(1, os.path.join(os.path.dirname(__file__), "ext", "velib_python"
 from vedbus import VeDbusService  # noqa: E402
 from ve_utils import get_vrm_portal_id  # noqa: E402
 
+from deadband import Deadband, get_thresholds  # noqa: E402
+from capture import CaptureWriter  # noqa: E402
+from checkpoint import Checkpoint, get_state  # noqa: E402
+from decoder import JSON_BACKEND  # noqa: E402
+from metrics import MetricsServer  # noqa: E402
+from mqtt_glib import GLibMqttLoop  # noqa: E402
+from profiling import Profiler  # noqa: E402
+from pvservice import DbusMqttPvService, get_devices, get_paths, log_suppressed_errors, on_message  # noqa: E402
+from reconnect import Reconnector  # noqa: E402
+from stats import get_windows  # noqa: E402
+
 
 # get values from config.ini file
 try:
@@ -70,336 +82,118 @@ else:
     timeout = 60
 
 
+# wait for the first data before the D-Bus service is registered
+# if disabled, the service is registered immediately with invalid values, which are set as soon as the first data is received
+wait_for_first_data = config["DEFAULT"].get("wait_for_first_data", "1") == "1"
+
+
+# get D-Bus publish mode
+# timer = the received values are published every publish_interval_max milliseconds
+# event = the received values are published as soon as they are received, but not more often than every publish_interval_min milliseconds
+publish_mode = config["DEFAULT"].get("publish_mode", "timer")
+publish_interval_min = int(config["DEFAULT"].get("publish_interval_min", "100"))
+publish_interval_max = int(config["DEFAULT"].get("publish_interval_max", "1000"))
+
+# emit a PropertiesChanged signal for each changed path in addition to the ItemsChanged signal, for consumers not supporting ItemsChanged
+dbus_properties_changed = config["DEFAULT"].get("dbus_properties_changed", "0") == "1"
+
+# include the Text of the values in the signals, else it is only rendered when a consumer requests it
+dbus_signal_text = config["DEFAULT"].get("dbus_signal_text", "1") == "1"
+
+# get deadbands, changes within the deadband of a path are not published
+if "DEADBAND" in config:
+    deadband_thresholds = get_thresholds(config["DEADBAND"])
+    deadband_refresh = int(config["DEADBAND"].get("refresh", "60"))
+else:
+    deadband_thresholds = {}
+    deadband_refresh = 60
+
+# all deadbands in the sample config are 0, which is the same as no deadband
+deadband_enabled = any(absolute or relative for absolute, relative in deadband_thresholds.values())
+
+
+# get the windows of the power statistics in minutes, like "1, 15"
+stats_windows = get_windows(config["DEFAULT"].get("stats_windows", ""))
+
+# save the calculated energy to a checkpoint file, which is restored after a restart
+# the file is written at most every checkpoint_interval minutes and when the driver stops
+# the default is next to the driver folder, since an update replaces the folder, like /data/etc/dbus-mqtt-pv_checkpoint.json
+checkpoint_file = config["DEFAULT"].get("checkpoint_file", os.path.dirname(os.path.realpath(__file__)) + "_checkpoint.json")
+checkpoint_interval = int(config["DEFAULT"].get("checkpoint_interval", "15")) * 60
+
+# serve the metrics of the driver internals in the Prometheus text format, 0 = disabled
+metrics_port = int(config["DEFAULT"].get("metrics_port", "0"))
+metrics_address = config["DEFAULT"].get("metrics_address", "127.0.0.1")
+
+# profile the running driver with SIGUSR1 (cProfile) and SIGUSR2 (tracemalloc), the results are written to profile_dir
+# the default is the log folder of this instance, like /data/log/dbus-mqtt-pv-2 for /data/etc/dbus-mqtt-pv-2
+profile_dir = config["DEFAULT"].get("profile_dir", os.path.join("/data/log", os.path.basename(os.path.dirname(os.path.realpath(__file__)))))
+profile_max_duration = int(config["DEFAULT"].get("profile_max_duration", "300"))
+
+
+# get devices
+try:
+    device_list = get_devices(config)
+
+    # map the topics to the devices, so that received messages can be routed to the right device
+    devices = {device.topic: device for device in device_list}
+
+    if len(devices) != len(device_list):
+        print("ERROR:Every device needs its own topic. The driver restarts in 60 seconds.")
+        sleep(60)
+        sys.exit()
+
+    if len({device.instance for device in device_list}) != len(device_list):
+        print("ERROR:Every device needs its own device_instance. The driver restarts in 60 seconds.")
+        sleep(60)
+        sys.exit()
+
+except (KeyError, ValueError) as e:
+    print(f"ERROR:Invalid device configuration: {repr(e)}. The driver restarts in 60 seconds.")
+    sleep(60)
+    sys.exit()
+
+
 # set variables
-connected = 0
-last_changed = 0
-last_updated = 0
-
-pv_power = -1
-pv_current = 0
-pv_voltage = 0
-pv_forward = 0
-standby_power = float(config["PV"].get("standby_power", "0"))
-
-pv_L1_power = None
-pv_L1_current = None
-pv_L1_voltage = None
-pv_L1_frequency = None
-pv_L1_power_factor = None
-pv_L1_forward = None
-
-pv_L2_power = None
-pv_L2_current = None
-pv_L2_voltage = None
-pv_L2_frequency = None
-pv_L2_power_factor = None
-pv_L2_forward = None
-
-pv_L3_power = None
-pv_L3_current = None
-pv_L3_voltage = None
-pv_L3_frequency = None
-pv_L3_power_factor = None
-pv_L3_forward = None
+reconnector = None
+
+
+def get_bus():
+    # private connection to the session bus whenever present, else to the system bus
+    return dbus.SessionBus(private=True) if "DBUS_SESSION_BUS_ADDRESS" in os.environ else dbus.SystemBus(private=True)
 
 
 # MQTT requests
 def on_disconnect(client, userdata, flags, reason_code, properties):
-    global connected
-    logging.warning("MQTT client: Got disconnected")
     if reason_code != 0:
-        logging.warning("MQTT client: Unexpected MQTT disconnection. Will auto-reconnect")
+        logging.warning("MQTT client: Unexpected MQTT disconnection, reason_code: %s" % reason_code)
     else:
-        logging.warning("MQTT client: reason_code value:" + str(reason_code))
+        logging.warning("MQTT client: Got disconnected")
 
-    while connected == 0:
-        try:
-            logging.warning(f"MQTT client: Trying to reconnect to broker {config['MQTT']['broker_address']} on port {config['MQTT']['broker_port']}")
-            client.connect(host=config["MQTT"]["broker_address"], port=int(config["MQTT"]["broker_port"]))
-            connected = 1
-        except Exception as err:
-            logging.error(f"MQTT client: Error in retrying to connect with broker ({config['MQTT']['broker_address']}:{config['MQTT']['broker_port']}): {err}")
-            logging.error("MQTT client: Retrying in 15 seconds")
-            connected = 0
-            sleep(15)
+    reconnector.disconnected()
 
 
 def on_connect(client, userdata, flags, reason_code, properties):
-    global connected
     if reason_code == 0:
         logging.info("MQTT client: Connected to MQTT broker!")
-        connected = 1
-        client.subscribe(config["MQTT"]["topic"])
+        reconnector.connected()
+        client.subscribe([(topic, 0) for topic in devices])
     else:
-        logging.error("MQTT client: Failed to connect, return code %d\n", reason_code)
-
-
-def on_message(client, userdata, msg):
-    try:
-
-        global last_changed, pv_power, pv_current, pv_voltage, pv_forward
-        global pv_L1_power, pv_L1_current, pv_L1_voltage, pv_L1_frequency, pv_L1_power_factor, pv_L1_forward
-        global pv_L2_power, pv_L2_current, pv_L2_voltage, pv_L2_frequency, pv_L2_power_factor, pv_L2_forward
-        global pv_L3_power, pv_L3_current, pv_L3_voltage, pv_L3_frequency, pv_L3_power_factor, pv_L3_forward
-
-        # get JSON from topic
-        if msg.topic == config["MQTT"]["topic"]:
-            if msg.payload != "" and msg.payload != b"":
-                jsonpayload = json.loads(msg.payload)
-
-                last_changed = int(time())
-
-                if "pv" in jsonpayload:
-                    if isinstance(jsonpayload["pv"], dict):
-                        if "power" in jsonpayload["pv"]:
-                            pv_power = float(jsonpayload["pv"]["power"])
-                            pv_power_above_threshold = pv_power > standby_power
-                            pv_power = pv_power if pv_power_above_threshold else 0.0
-                            pv_current = float(jsonpayload["pv"]["current"]) if "current" in jsonpayload["pv"] else pv_power / float(config["DEFAULT"]["voltage"])
-                            pv_current = pv_current if pv_power_above_threshold else 0.0
-                            pv_voltage = float(jsonpayload["pv"]["voltage"]) if "voltage" in jsonpayload["pv"] else float(config["DEFAULT"]["voltage"])
-                            if "energy_forward" in jsonpayload["pv"]:
-                                pv_forward = float(jsonpayload["pv"]["energy_forward"])
-
-                            # check if L1 and L1 -> power exists
-                            if "L1" in jsonpayload["pv"] and "power" in jsonpayload["pv"]["L1"]:
-                                pv_L1_power = float(jsonpayload["pv"]["L1"]["power"])
-                                pv_L1_current = float(jsonpayload["pv"]["L1"]["current"]) if "current" in jsonpayload["pv"]["L1"] else pv_L1_power / float(config["DEFAULT"]["voltage"])
-                                pv_L1_voltage = float(jsonpayload["pv"]["L1"]["voltage"]) if "voltage" in jsonpayload["pv"]["L1"] else float(config["DEFAULT"]["voltage"])
-                                pv_L1_frequency = float(jsonpayload["pv"]["L1"]["frequency"]) if "frequency" in jsonpayload["pv"]["L1"] else float(config["DEFAULT"]["frequency"])
-                                pv_L1_power_factor = float(jsonpayload["pv"]["L1"]["power_factor"]) if "power_factor" in jsonpayload["pv"]["L1"] else None
-                                if "energy_forward" in jsonpayload["pv"]["L1"]:
-                                    pv_L1_forward = float(jsonpayload["pv"]["L1"]["energy_forward"])
-
-                            # check if L2 and L2 -> power exists
-                            if "L2" in jsonpayload["pv"] and "power" in jsonpayload["pv"]["L2"]:
-                                pv_L2_power = float(jsonpayload["pv"]["L2"]["power"])
-                                pv_L2_current = float(jsonpayload["pv"]["L2"]["current"]) if "current" in jsonpayload["pv"]["L2"] else pv_L2_power / float(config["DEFAULT"]["voltage"])
-                                pv_L2_voltage = float(jsonpayload["pv"]["L2"]["voltage"]) if "voltage" in jsonpayload["pv"]["L2"] else float(config["DEFAULT"]["voltage"])
-                                pv_L2_frequency = float(jsonpayload["pv"]["L2"]["frequency"]) if "frequency" in jsonpayload["pv"]["L2"] else float(config["DEFAULT"]["frequency"])
-                                pv_L2_power_factor = float(jsonpayload["pv"]["L2"]["power_factor"]) if "power_factor" in jsonpayload["pv"]["L2"] else None
-                                if "energy_forward" in jsonpayload["pv"]["L2"]:
-                                    pv_L2_forward = float(jsonpayload["pv"]["L2"]["energy_forward"])
-
-                            # check if L3 and L3 -> power exists
-                            if "L3" in jsonpayload["pv"] and "power" in jsonpayload["pv"]["L3"]:
-                                pv_L3_power = float(jsonpayload["pv"]["L3"]["power"])
-                                pv_L3_current = float(jsonpayload["pv"]["L3"]["current"]) if "current" in jsonpayload["pv"]["L3"] else pv_L3_power / float(config["DEFAULT"]["voltage"])
-                                pv_L3_voltage = float(jsonpayload["pv"]["L3"]["voltage"]) if "voltage" in jsonpayload["pv"]["L3"] else float(config["DEFAULT"]["voltage"])
-                                pv_L3_frequency = float(jsonpayload["pv"]["L3"]["frequency"]) if "frequency" in jsonpayload["pv"]["L3"] else float(config["DEFAULT"]["frequency"])
-                                pv_L3_power_factor = float(jsonpayload["pv"]["L3"]["power_factor"]) if "power_factor" in jsonpayload["pv"]["L3"] else None
-                                if "energy_forward" in jsonpayload["pv"]["L3"]:
-                                    pv_L3_forward = float(jsonpayload["pv"]["L3"]["energy_forward"])
-                        # for Tasmota support
-                        # the power and power_L1-3 values have to be sent within the same second or
-                        # power as last one, else on startup the phases are not correctly recognized
-                        elif "power_L1" in jsonpayload["pv"]:
-                            pv_L1_power = float(jsonpayload["pv"]["power_L1"])
-                            pv_L1_voltage = float(config["DEFAULT"]["voltage"])
-                            pv_L1_current = pv_L1_power / float(config["DEFAULT"]["voltage"])
-                            pv_L1_frequency = float(config["DEFAULT"]["frequency"])
-                            pv_L1_forward = None
-                        elif "power_L2" in jsonpayload["pv"]:
-                            pv_L2_power = float(jsonpayload["pv"]["power_L2"])
-                            pv_L2_voltage = float(config["DEFAULT"]["voltage"])
-                            pv_L2_current = pv_L2_power / float(config["DEFAULT"]["voltage"])
-                            pv_L2_frequency = float(config["DEFAULT"]["frequency"])
-                            pv_L2_forward = None
-                        elif "power_L3" in jsonpayload["pv"]:
-                            pv_L3_power = float(jsonpayload["pv"]["power_L3"])
-                            pv_L3_voltage = float(config["DEFAULT"]["voltage"])
-                            pv_L3_current = pv_L3_power / float(config["DEFAULT"]["voltage"])
-                            pv_L3_frequency = float(config["DEFAULT"]["frequency"])
-                            pv_L3_forward = None
-                    else:
-                        logging.error('Received JSON MQTT message does not include a power object in the pv object. Expected at least: {"pv": {"power": 0.0}}')
-                        logging.debug("MQTT payload: " + str(msg.payload)[1:])
-
-                elif "apower" in jsonpayload:
-                    pv_power = float(jsonpayload.get("apower", 0))
-                    pv_power_above_threshold = pv_power > standby_power
-                    pv_power = pv_power if pv_power_above_threshold else 0.0
-
-                    pv_current = float(jsonpayload.get("current", pv_power / float(config["DEFAULT"]["voltage"])))
-                    pv_current = pv_current if pv_power_above_threshold else 0.0
-                    pv_voltage = float(jsonpayload.get("voltage", float(config["DEFAULT"]["voltage"])))
-                    pv_forward = float(jsonpayload.get("aenergy").get("total")) / 1000 if "aenergy" in jsonpayload and "total" in jsonpayload["aenergy"] else None
-
-                    pv_L1_power = pv_power
-                    pv_L1_current = pv_current
-                    pv_L1_voltage = pv_voltage
-                    pv_L1_frequency = float(jsonpayload.get("freq", float(config["DEFAULT"]["frequency"])))
-                    pv_L1_power_factor = float(jsonpayload.get("pf")) if "pf" in jsonpayload else None
-                    pv_L1_forward = pv_forward
-
-                    # Clear multi-phase values
-                    pv_L2_power = None
-                    pv_L2_current = None
-                    pv_L2_voltage = None
-                    pv_L2_frequency = None
-                    pv_L2_forward = None
-
-                    pv_L3_power = None
-                    pv_L3_current = None
-                    pv_L3_voltage = None
-                    pv_L3_frequency = None
-                    pv_L3_forward = None
-
-                else:
-                    logging.error('Received JSON MQTT message does not include a pv object. Expected at least: {"pv": {"power": 0.0}}')
-                    logging.debug("MQTT payload: " + str(msg.payload)[1:])
-
-            else:
-                logging.warning("Received JSON MQTT message was empty and therefore it was ignored")
-                logging.debug("MQTT payload: " + str(msg.payload)[1:])
-
-    except TypeError as e:
-        logging.error("Received message is not valid. Check the README and sample payload. %s" % e)
-        logging.debug("MQTT payload: " + str(msg.payload)[1:])
-
-    except ValueError as e:
-        logging.error("Received message is not a valid JSON. Check the README and sample payload. %s" % e)
-        logging.debug("MQTT payload: " + str(msg.payload)[1:])
-
-    except Exception:
-        exception_type, exception_object, exception_traceback = sys.exc_info()
-        file = exception_traceback.tb_frame.f_code.co_filename
-        line = exception_traceback.tb_lineno
-        logging.error(f"Exception occurred: {repr(exception_object)} of type {exception_type} in {file} line #{line}")
-        logging.debug("MQTT payload: " + str(msg.payload)[1:])
-
-
-class DbusMqttPvService:
-    def __init__(
-        self,
-        servicename,
-        deviceinstance,
-        paths,
-        productname="MQTT PV",
-        customname="MQTT PV",
-        connection="MQTT PV service",
-    ):
-
-        self._dbusservice = VeDbusService(servicename, register=False)
-        self._paths = paths
-
-        logging.debug("%s /DeviceInstance = %d" % (servicename, deviceinstance))
-
-        # Create the management objects, as specified in the ccgx dbus-api document
-        self._dbusservice.add_path("/Mgmt/ProcessName", __file__)
-        self._dbusservice.add_path(
-            "/Mgmt/ProcessVersion",
-            "Unkown version, and running on Python " + platform.python_version(),
-        )
-        self._dbusservice.add_path("/Mgmt/Connection", connection)
-
-        # Create the mandatory objects
-        self._dbusservice.add_path("/DeviceInstance", deviceinstance)
-        self._dbusservice.add_path("/ProductId", 0xFFFF)
-        self._dbusservice.add_path("/ProductName", productname)
-        self._dbusservice.add_path("/CustomName", customname)
-        self._dbusservice.add_path("/FirmwareVersion", "0.1.10-dev (20250929)")
-        # self._dbusservice.add_path('/HardwareVersion', '')
-        self._dbusservice.add_path("/Connected", 1)
-
-        self._dbusservice.add_path("/Latency", None)
-        self._dbusservice.add_path("/ErrorCode", 0)
-        self._dbusservice.add_path("/Position", int(config["PV"]["position"]))  # only needed for pvinverter
-        self._dbusservice.add_path("/StatusCode", 0)  # Dummy path so VRM detects us as a PV-inverter
-
-        for path, settings in self._paths.items():
-            self._dbusservice.add_path(
-                path,
-                settings["initial"],
-                gettextcallback=settings["textformat"],
-                writeable=True,
-                onchangecallback=self._handlechangedvalue,
-            )
-
-        # register VeDbusService after all paths where added
-        self._dbusservice.register()
-
-        GLib.timeout_add(1000, self._update)  # pause 1000ms before the next request
-
-    def _update(self):
-
-        global last_changed, last_updated
-
-        now = int(time())
-
-        if last_changed != last_updated:
-
-            self._dbusservice["/Ac/Power"] = round(pv_power, 2) if pv_power is not None else None
-            self._dbusservice["/Ac/Current"] = round(pv_current, 2) if pv_current is not None else None
-            self._dbusservice["/Ac/Voltage"] = round(pv_voltage, 2) if pv_voltage is not None else None
-            self._dbusservice["/Ac/Energy/Forward"] = round(pv_forward, 2) if pv_forward is not None else None
-
-            if pv_L1_power is not None:
-                self._dbusservice["/Ac/L1/Power"] = round(pv_L1_power, 2) if pv_L1_power is not None else None
-                self._dbusservice["/Ac/L1/Current"] = round(pv_L1_current, 2) if pv_L1_current is not None else None
-                self._dbusservice["/Ac/L1/Voltage"] = round(pv_L1_voltage, 2) if pv_L1_voltage is not None else None
-                self._dbusservice["/Ac/L1/Frequency"] = round(pv_L1_frequency, 2) if pv_L1_frequency is not None else None
-                self._dbusservice["/Ac/L1/PowerFactor"] = round(pv_L1_power_factor, 3) if pv_L1_power_factor is not None else None
-                self._dbusservice["/Ac/L1/Energy/Forward"] = round(pv_L1_forward, 2) if pv_L1_forward is not None else None
-            # at least one phase is needed to work properly
-            elif pv_L2_power is None and pv_L3_power is None:
-                self._dbusservice["/Ac/L1/Power"] = round(pv_power, 2) if pv_power is not None else None
-                self._dbusservice["/Ac/L1/Current"] = round(pv_current, 2) if pv_current is not None else None
-                self._dbusservice["/Ac/L1/Voltage"] = round(pv_voltage, 2) if pv_voltage is not None else None
-                self._dbusservice["/Ac/L1/Frequency"] = None
-                self._dbusservice["/Ac/L1/Energy/Forward"] = round(pv_forward, 2) if pv_forward is not None else None
-
-            if pv_L2_power is not None:
-                self._dbusservice["/Ac/L2/Power"] = round(pv_L2_power, 2) if pv_L2_power is not None else None
-                self._dbusservice["/Ac/L2/Current"] = round(pv_L2_current, 2) if pv_L2_current is not None else None
-                self._dbusservice["/Ac/L2/Voltage"] = round(pv_L2_voltage, 2) if pv_L2_voltage is not None else None
-                self._dbusservice["/Ac/L2/Frequency"] = round(pv_L2_frequency, 2) if pv_L2_frequency is not None else None
-                self._dbusservice["/Ac/L2/PowerFactor"] = round(pv_L2_power_factor, 3) if pv_L2_power_factor is not None else None
-                self._dbusservice["/Ac/L2/Energy/Forward"] = round(pv_L2_forward, 2) if pv_L2_forward is not None else None
-
-            if pv_L3_power is not None:
-                self._dbusservice["/Ac/L3/Power"] = round(pv_L3_power, 2) if pv_L3_power is not None else None
-                self._dbusservice["/Ac/L3/Current"] = round(pv_L3_current, 2) if pv_L3_current is not None else None
-                self._dbusservice["/Ac/L3/Voltage"] = round(pv_L3_voltage, 2) if pv_L3_voltage is not None else None
-                self._dbusservice["/Ac/L3/Frequency"] = round(pv_L3_frequency, 2) if pv_L3_frequency is not None else None
-                self._dbusservice["/Ac/L3/PowerFactor"] = round(pv_L3_power_factor, 3) if pv_L3_power_factor is not None else None
-                self._dbusservice["/Ac/L3/Energy/Forward"] = round(pv_L3_forward, 2) if pv_L3_forward is not None else None
-
-            logging.debug("PV: {:.1f} W - {:.1f} V - {:.1f} A".format(pv_power, pv_voltage, pv_current))
-            if pv_L1_power:
-                logging.debug("|- L1: {:.1f} W - {:.1f} V - {:.1f} A".format(pv_L1_power, pv_L1_voltage, pv_L1_current))
-            if pv_L2_power:
-                logging.debug("|- L2: {:.1f} W - {:.1f} V - {:.1f} A".format(pv_L2_power, pv_L2_voltage, pv_L2_current))
-            if pv_L3_power:
-                logging.debug("|- L3: {:.1f} W - {:.1f} V - {:.1f} A".format(pv_L3_power, pv_L3_voltage, pv_L3_current))
-
-            # is only displayed for Fronius inverters (product ID 0xA142) in GUI but displayed in VRM portal
-            # if power above 10 W, set status code to 7 (running)
-            if self._dbusservice["/Ac/Power"] >= 10:
-                if self._dbusservice["/StatusCode"] != 7:
-                    self._dbusservice["/StatusCode"] = 7
-            # else set status code to 8 (standby)
-            else:
-                if self._dbusservice["/StatusCode"] != 8:
-                    self._dbusservice["/StatusCode"] = 8
+        logging.error("MQTT client: Failed to connect, return code %s" % reason_code)
 
-            last_updated = last_changed
 
-        # quit driver if timeout is exceeded
-        if timeout != 0 and (now - last_changed) > timeout:
-            logging.error("Driver stopped. Timeout of %i seconds exceeded, since no new MQTT message was received in this time." % timeout)
-            sys.exit()
+def on_connect_fail(client, userdata):
+    logging.error(f"MQTT client: Error in retrying to connect with broker ({config['MQTT']['broker_address']}:{config['MQTT']['broker_port']})")
+    reconnector.connect_failed()
 
-        # increment UpdateIndex - to show that new data is available
-        index = self._dbusservice["/UpdateIndex"] + 1  # increment index
-        if index > 255:  # maximum value of the index
-            index = 0  # overflow from 255 to 0
-        self._dbusservice["/UpdateIndex"] = index
-        return True
 
-    def _handlechangedvalue(self, path, value):
-        logging.debug("someone else updated %s to %s" % (path, value))
-        return True  # accept the change
+def get_states():
+    states = {}
+    for device in device_list:
+        # the MQTT thread removes the restored channels
+        with device.lock:
+            states[device.topic] = get_state(device.snapshot, device.restored)
+    return states
 
 
 def main():
@@ -412,11 +206,45 @@ def main():
     # Have a mainloop, so we can send/receive asynchronous calls to and from dbus
     DBusGMainLoop(set_as_default=True)
 
+    logging.info("Using %s to decode the JSON payloads" % JSON_BACKEND)
+
     # MQTT setup
-    client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id="MqttPv_" + get_vrm_portal_id() + "_" + str(config["DEFAULT"]["device_instance"]))
+    client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, client_id="MqttPv_" + get_vrm_portal_id() + "_" + str(device_list[0].instance), userdata=devices)
     client.on_disconnect = on_disconnect
     client.on_connect = on_connect
     client.on_message = on_message
+    client.on_connect_fail = on_connect_fail
+
+    # append every received MQTT message to a capture file, which can be replayed with "benchmarks/replay_capture.py"
+    if config["MQTT"].get("capture_file", "") != "":
+        logging.warning('MQTT client: Capturing all received messages to "%s"' % config["MQTT"]["capture_file"])
+        capture = CaptureWriter(
+            config["MQTT"]["capture_file"],
+            max_size=int(config["MQTT"].get("capture_max_size", "10240")) * 1024,
+            backups=int(config["MQTT"].get("capture_backups", "3")),
+        )
+        client.on_message = capture.wrap(on_message)
+
+    # started with SIGUSR1
+    profiler = Profiler(profile_dir, profile_max_duration, scheduler=GLib)
+
+    # run the MQTT network I/O in paho's own thread or in the GLib.MainLoop()
+    if config["MQTT"].get("loop", "thread") == "glib":
+        logging.info("MQTT client: Network I/O runs in the GLib.MainLoop()")
+        mqtt_glib_loop = GLibMqttLoop(client)
+    else:
+        mqtt_glib_loop = None
+        # profiles paho's whole network thread, while the profiling is started with SIGUSR1
+        client._loop = profiler.wrap_loop(client._loop)
+
+    # reconnect with exponential backoff, if the connection is lost
+    global reconnector
+    reconnector = Reconnector(
+        client,
+        min_delay=float(config["MQTT"].get("reconnect_delay_min", "1")),
+        max_delay=float(config["MQTT"].get("reconnect_delay_max", "60")),
+        schedule=(lambda delay, callback: GLib.timeout_add(int(delay * 1000), callback)) if mqtt_glib_loop is not None else None,
+    )
 
     # check tls and use settings, if provided
     if "tls_enabled" in config["MQTT"] and config["MQTT"]["tls_enabled"] == "1":
@@ -437,99 +265,131 @@ def main():
         logging.info('MQTT client: Using username "%s" and password to connect' % config["MQTT"]["username"])
         client.username_pw_set(username=config["MQTT"]["username"], password=config["MQTT"]["password"])
 
+    # restore the energy from the last run, the first received values of every device decide if it is used
+    if checkpoint_file != "":
+        checkpoint = Checkpoint(checkpoint_file, checkpoint_interval)
+        states = checkpoint.load()
+        for device in device_list:
+            if states.get(device.topic):
+                device.restored = states[device.topic]
+
+        # also saves on the timeout, since it stops the driver with sys.exit()
+        atexit.register(lambda: checkpoint.save(get_states(), force=True))
+    else:
+        checkpoint = None
+
     # connect to broker
     logging.info(f"MQTT client: Connecting to broker {config['MQTT']['broker_address']} on port {config['MQTT']['broker_port']}")
     client.connect(host=config["MQTT"]["broker_address"], port=int(config["MQTT"]["broker_port"]))
-    client.loop_start()
+    if mqtt_glib_loop is not None:
+        mqtt_glib_loop.start()
+    else:
+        client.loop_start()
+
+    # all devices share the MQTT connection and the GLib.MainLoop(), but every D-Bus service needs its own
+    # bus connection, since the object paths (like /Ac/Power) of the services are the same
+    services = []
+
+    def add_service(device):
+        services.append(
+            DbusMqttPvService(
+                dbusservice=VeDbusService(
+                    "com.victronenergy.pvinverter.mqtt_pv_" + str(device.instance),
+                    bus=get_bus() if len(device_list) > 1 else None,
+                    register=False,
+                    propertieschanged=dbus_properties_changed,
+                    signaltext=dbus_signal_text,
+                ),
+                device=device,
+                paths=get_paths(device, stats_windows),
+                scheduler=GLib,
+                reconnector=reconnector,
+                publish_mode=publish_mode,
+                publish_interval_min=publish_interval_min,
+                publish_interval_max=publish_interval_max,
+                timeout=timeout,
+                deadband=Deadband(deadband_thresholds, deadband_refresh) if deadband_enabled else None,
+                # with multiple devices only the device without messages is disconnected
+                on_timeout=sys.exit if len(device_list) == 1 else None,
+                stats_windows=stats_windows,
+            )
+        )
 
     # wait to receive first data, else the JSON is empty and phase setup won't work
-    i = 0
-    while pv_power == -1:
-        if i % 12 != 0 or i == 0:
-            logging.info("Waiting 5 seconds for receiving first data...")
+    # every device is registered on D-Bus as soon as its own first data was received
+    registered = set()
+
+    def add_service_on_first_data(device, start):
+        def register():
+            if device not in registered:
+                registered.add(device)
+                logging.info('Received first data on "%s" after %.3f seconds' % (device.topic, monotonic() - start))
+                add_service(device)
+            return False
+
+        def wait():
+            if device in registered:
+                return False
+            waited = monotonic() - start
+
+            # check if timeout was exceeded
+            if timeout != 0 and waited >= timeout and len(device_list) == 1:
+                logging.error('Driver stopped. Timeout of %i seconds exceeded, since no new MQTT message was received on "%s" in this time.' % (timeout, device.topic))
+                sys.exit()
+
+            if waited < 60:
+                logging.info('Waiting for receiving first data on "%s"...' % device.topic)
+            else:
+                logging.warning('Waiting since %i seconds for receiving first data on "%s"...' % (waited, device.topic))
+            return True
+
+        # called from the MQTT thread with the first data, the service is created in the GLib.MainLoop()
+        device.on_first_data = lambda: GLib.idle_add(register)
+        if device.first_data.is_set():
+            register()
+        elif wait():
+            GLib.timeout_add_seconds(5, wait)
+
+    start = monotonic()
+    for device in device_list:
+        if wait_for_first_data:
+            add_service_on_first_data(device, start)
         else:
-            logging.warning("Waiting since %s seconds for receiving first data..." % str(i * 5))
+            add_service(device)
 
-        # check if timeout was exceeded
-        if timeout != 0 and timeout <= (i * 5):
-            logging.error("Driver stopped. Timeout of %i seconds exceeded, since no new MQTT message was received in this time." % timeout)
-            sys.exit()
+    if metrics_port != 0:
+        try:
+            MetricsServer(metrics_address, metrics_port, device_list, services, reconnector, checkpoint).start()
+        except OSError as e:
+            logging.error("Metrics: Could not serve on %s:%i: %s" % (metrics_address, metrics_port, e))
 
-        sleep(5)
-        i += 1
-
-    # formatting
-    def _kwh(p, v):
-        return str("%.2f" % v) + "kWh"
-
-    def _a(p, v):
-        return str("%.1f" % v) + "A"
-
-    def _w(p, v):
-        return str("%i" % v) + "W"
-
-    def _v(p, v):
-        return str("%.2f" % v) + "V"
-
-    def _hz(p, v):
-        return str("%.4f" % v) + "Hz"
-
-    def _n(p, v):
-        return str("%i" % v)
-
-    paths_dbus = {
-        "/Ac/Power": {"initial": 0, "textformat": _w},
-        "/Ac/Current": {"initial": 0, "textformat": _a},
-        "/Ac/Voltage": {"initial": 0, "textformat": _v},
-        "/Ac/Energy/Forward": {"initial": None, "textformat": _kwh},
-        "/Ac/MaxPower": {"initial": int(config["PV"]["max"]), "textformat": _w},
-        "/Ac/Position": {"initial": int(config["PV"]["position"]), "textformat": _n},
-        "/Ac/StatusCode": {"initial": 0, "textformat": _n},
-        "/UpdateIndex": {"initial": 0, "textformat": _n},
-    }
-
-    paths_dbus.update(
-        {
-            "/Ac/L1/Power": {"initial": None, "textformat": _w},
-            "/Ac/L1/Current": {"initial": None, "textformat": _a},
-            "/Ac/L1/Voltage": {"initial": None, "textformat": _v},
-            "/Ac/L1/Frequency": {"initial": None, "textformat": _hz},
-            "/Ac/L1/PowerFactor": {"initial": None, "textformat": _n},
-            "/Ac/L1/Energy/Forward": {"initial": None, "textformat": _kwh},
-        }
-    )
+    logging.info("Connected to dbus and switching over to GLib.MainLoop() (= event based)")
+    mainloop = GLib.MainLoop()
 
-    paths_dbus.update(
-        {
-            "/Ac/L2/Power": {"initial": None, "textformat": _w},
-            "/Ac/L2/Current": {"initial": None, "textformat": _a},
-            "/Ac/L2/Voltage": {"initial": None, "textformat": _v},
-            "/Ac/L2/Frequency": {"initial": None, "textformat": _hz},
-            "/Ac/L2/PowerFactor": {"initial": None, "textformat": _n},
-            "/Ac/L2/Energy/Forward": {"initial": None, "textformat": _kwh},
-        }
-    )
+    if checkpoint is not None:
+        # check every minute, the checkpoint is only written if the interval passed
+        def save_checkpoint():
+            checkpoint.save(get_states())
+            return True
 
-    paths_dbus.update(
-        {
-            "/Ac/L3/Power": {"initial": None, "textformat": _w},
-            "/Ac/L3/Current": {"initial": None, "textformat": _a},
-            "/Ac/L3/Voltage": {"initial": None, "textformat": _v},
-            "/Ac/L3/Frequency": {"initial": None, "textformat": _hz},
-            "/Ac/L3/PowerFactor": {"initial": None, "textformat": _n},
-            "/Ac/L3/Energy/Forward": {"initial": None, "textformat": _kwh},
-        }
-    )
+        GLib.timeout_add_seconds(min(60, max(1, checkpoint_interval)), save_checkpoint)
 
-    DbusMqttPvService(
-        servicename="com.victronenergy.pvinverter.mqtt_pv_" + str(config["DEFAULT"]["device_instance"]),
-        deviceinstance=int(config["DEFAULT"]["device_instance"]),
-        customname=config["DEFAULT"]["device_name"],
-        paths=paths_dbus,
-    )
+    # log the errors, which were suppressed since the last logged one, also if no further error comes
+    GLib.timeout_add_seconds(10, log_suppressed_errors)
+
+    # stop the main loop on "svc -d", so that the checkpoint is saved on exit
+    def stop():
+        logging.info("Driver stopped by signal")
+        mainloop.quit()
+        return False
+
+    GLib.unix_signal_add(GLib.PRIORITY_HIGH, signal.SIGTERM, stop)
+    GLib.unix_signal_add(GLib.PRIORITY_HIGH, signal.SIGINT, stop)
+
+    # "kill -USR1 <pid>" starts and stops the profiling, "kill -USR2 <pid>" writes a memory snapshot
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGUSR1, profiler.toggle_profile)
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGUSR2, profiler.snapshot_memory)
 
-    logging.info("Connected to dbus and switching over to GLib.MainLoop() (= event based)")
-    mainloop = GLib.MainLoop()
     mainloop.run()
 
 
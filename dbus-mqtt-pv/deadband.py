@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+# Deadband filtering of insignificant value changes before they are published on D-Bus.
+#
+# A new value is published only, if it differs from the last published value by more than the
+# deadband of the path. The deadband is the larger of the absolute deadband and the relative
+# deadband (in percent of the last published value). After "refresh" seconds the value is
+# published regardless, so that small drifts still reach the D-Bus.
+
+# path classes, which can have a deadband, by the end of the path
+PATH_CLASSES = (
+    ("/Energy/Forward", "energy"),
+    ("/Power", "power"),
+    ("/Current", "current"),
+    ("/Voltage", "voltage"),
+    ("/Frequency", "frequency"),
+)
+
+
+def get_path_class(path):
+    for suffix, path_class in PATH_CLASSES:
+        if path.endswith(suffix):
+            return path_class
+    return None
+
+
+def get_thresholds(section):
+    """Return the deadbands configured in a config section as dict ``{class or lowercase path: (absolute, relative)}``.
+
+    Keys are ``<class or path>_absolute`` and ``<class or path>_relative`` (in percent), like ``power_absolute = 2``
+    or ``/Ac/L1/Power_relative = 0.5``.
+    """
+    thresholds = {}
+    for key, value in section.items():
+        name, _, kind = key.rpartition("_")
+        if kind not in ("absolute", "relative") or name == "":
+            continue
+        absolute, relative = thresholds.get(name.lower(), (0.0, 0.0))
+        if kind == "absolute":
+            absolute = float(value)
+        else:
+            relative = float(value) / 100
+        thresholds[name.lower()] = (absolute, relative)
+    return thresholds
+
+
+class Deadband:
+    def __init__(self, thresholds, refresh=60):
+        self._thresholds = thresholds
+        self._refresh = refresh
+
+        # deadband per path, resolved on first use
+        self._path_thresholds = {}
+        # last published value and time per path
+        self._last = {}
+
+        # counters
+        self.passed = 0
+        self.suppressed = 0
+
+    @property
+    def suppression_ratio(self):
+        total = self.passed + self.suppressed
+        return self.suppressed / total if total else 0.0
+
+    def _get_path_thresholds(self, path):
+        thresholds = self._thresholds.get(path.lower())
+        if thresholds is None:
+            thresholds = self._thresholds.get(get_path_class(path))
+        # paths without deadband are not filtered
+        if thresholds is not None and thresholds == (0.0, 0.0):
+            thresholds = None
+        self._path_thresholds[path] = thresholds
+        return thresholds
+
+    def accept(self, path, value, now):
+        """Return True, if the value of the path should be published."""
+        try:
+            thresholds = self._path_thresholds[path]
+        except KeyError:
+            thresholds = self._get_path_thresholds(path)
+
+        if thresholds is None:
+            return True
+
+        last = self._last.get(path)
+        if last is not None:
+            last_value, last_time = last
+            if value == last_value:
+                return True
+            if value is not None and last_value is not None and now - last_time < self._refresh:
+                absolute, relative = thresholds
+                if abs(value - last_value) <= max(absolute, relative * abs(last_value)):
+                    self.suppressed += 1
+                    return False
+
+        self._last[path] = (value, now)
+        self.passed += 1
+        return True
+
+    def filter(self, dbusservice, now):
+        """Return a wrapper of the VeDbusService (or its ServiceContext), which drops insignificant changes."""
+        return DeadbandFilter(self, dbusservice, now)
+
+
+class DeadbandFilter:
+    def __init__(self, deadband, dbusservice, now):
+        self._deadband = deadband
+        self._dbusservice = dbusservice
+        self._now = now
+
+    def __getitem__(self, path):
+        return self._dbusservice[path]
+
+    def __setitem__(self, path, value):
+        if self._deadband.accept(path, value, self._now):
+            self._dbusservice[path] = value
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+
+# Payload decoders for the supported MQTT JSON formats.
+#
+# The decoders are built once at startup with all config derived constants (voltage, frequency,
+# standby power) already resolved, so that decoding a message only touches the JSON payload.
+#
+# Supported formats:
+#   - generic: {"pv": {"power": 0.0, "L1": {"power": 0.0}, ...}, "timestamp": 0.0}
+#   - Tasmota: {"pv": {"power_L1": 0.0}} (one phase per message)
+#   - Shelly Gen2+: {"apower": 0.0, ...}
+#
+# If a payload does not contain the energy, it is integrated from the power values over the time
+# between the messages (trapezoidal rule), separately for the total and every phase. Gaps longer than
+# the maximum gap are not integrated, since the power in between is unknown.
+#
+# Every decoded message results in a new snapshot. Snapshots are never modified after they were
+# created, so the MQTT thread can hand them over to the GLib thread with a single reference
+# assignment and the GLib thread always publishes the values of exactly one message.
+
+import math
+
+# use the fastest available JSON decoder, selected once at import time
+try:
+    import orjson
+
+    json_loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    try:
+        import ujson
+
+        json_loads = ujson.loads
+        JSON_BACKEND = "ujson"
+    except ImportError:
+        import json
+
+        json_loads = json.loads
+        JSON_BACKEND = "json"
+
+
+PHASES = ("L1", "L2", "L3")
+
+
+class PayloadError(ValueError):
+    """Raised when a JSON payload does not match any of the supported formats."""
+
+
+class PhaseSnapshot:
+    """Measurement values of one phase. Must not be modified once created.
+
+    ``time`` is the receive time of the message, which contained the values.
+    """
+
+    __slots__ = ("power", "current", "voltage", "frequency", "power_factor", "forward", "time")
+
+    def __init__(self, power, current, voltage, frequency, power_factor, forward, time):
+        self.power = power
+        self.current = current
+        self.voltage = voltage
+        self.frequency = frequency
+        self.power_factor = power_factor
+        self.forward = forward
+        self.time = time
+
+
+class PvSnapshot:
+    """Measurement values of a device. Must not be modified once created.
+
+    Phases without values are ``None``. ``time`` is the receive time of the message, which contained
+    the total values. ``device_time`` is the Unix time, at which the device sent the message, if the
+    payload contained it.
+    """
+
+    __slots__ = ("power", "current", "voltage", "forward", "L1", "L2", "L3", "time", "device_time")
+
+    def __init__(self, power, current, voltage, forward, L1, L2, L3, time, device_time=None):
+        self.power = power
+        self.current = current
+        self.voltage = voltage
+        self.forward = forward
+        self.L1 = L1
+        self.L2 = L2
+        self.L3 = L3
+        self.time = time
+        self.device_time = device_time
+
+
+# values before the first message was received
+EMPTY_SNAPSHOT = PvSnapshot(None, None, None, None, None, None, None, None)
+
+# Unix times above are in milliseconds, in seconds this would be the year 5138
+MILLISECONDS_FROM = 1e11
+
+
+def get_device_time(value):
+    """Return the ``timestamp`` of a payload as Unix time in seconds, or ``None`` if it is not a finite number.
+
+    Values in milliseconds are converted to seconds. Other formats, like ISO 8601 strings, are ignored,
+    since the values of the payload are still valid.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        device_time = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(device_time):
+        return None
+    return device_time / 1000 if device_time >= MILLISECONDS_FROM else device_time
+
+
+def build_decoder(voltage, frequency, standby_power, energy_integration=True, max_gap=60):
+    """Build the decoder for a device.
+
+    Returns a function ``decode(jsonpayload, previous, timestamp=0.0)`` which returns the new
+    ``PvSnapshot``, or ``None`` if the payload contains no values. Values not contained in the payload
+    are taken from the ``previous`` snapshot. ``timestamp`` is the monotonic receive time of the message
+    in seconds. Raises ``PayloadError`` if the payload has an unknown format.
+
+    :param energy_integration: integrate the power to the energy, if the payload contains no energy
+    :param max_gap: seconds between two messages, above which the power is not integrated
+    """
+    voltage = float(voltage)
+    frequency = float(frequency)
+    standby_power = float(standby_power)
+    max_gap = float(max_gap)
+
+    def integrate(previous, power, timestamp):
+        # returns the energy forward of the previous snapshot plus the energy since the previous message
+        if previous is None or previous.forward is None:
+            return 0.0 if energy_integration else None
+        if not energy_integration:
+            return previous.forward
+        elapsed = timestamp - previous.time
+        if elapsed <= 0 or elapsed > max_gap:
+            return previous.forward
+        # W * s to kWh, with the average power of both messages
+        return previous.forward + (max(0.0, previous.power) + max(0.0, power)) * elapsed / 7200000
+
+    def decode_phase(pv_phase, previous_phase, timestamp):
+        # check if Lx and Lx -> power exists
+        if pv_phase is None or "power" not in pv_phase:
+            return previous_phase
+
+        power = float(pv_phase["power"])
+        if "energy_forward" in pv_phase:
+            forward = float(pv_phase["energy_forward"])
+        else:
+            forward = integrate(previous_phase, power, timestamp)
+
+        return PhaseSnapshot(
+            power,
+            float(pv_phase["current"]) if "current" in pv_phase else power / voltage,
+            float(pv_phase["voltage"]) if "voltage" in pv_phase else voltage,
+            float(pv_phase["frequency"]) if "frequency" in pv_phase else frequency,
+            float(pv_phase["power_factor"]) if "power_factor" in pv_phase else None,
+            forward,
+            timestamp,
+        )
+
+    def decode_generic(pv, previous, timestamp, device_time):
+        power = float(pv["power"])
+        power_above_threshold = power > standby_power
+        power = power if power_above_threshold else 0.0
+        current = float(pv["current"]) if "current" in pv else power / voltage
+
+        return PvSnapshot(
+            power,
+            current if power_above_threshold else 0.0,
+            float(pv["voltage"]) if "voltage" in pv else voltage,
+            float(pv["energy_forward"]) if "energy_forward" in pv else integrate(previous, power, timestamp),
+            decode_phase(pv.get("L1"), previous.L1, timestamp),
+            decode_phase(pv.get("L2"), previous.L2, timestamp),
+            decode_phase(pv.get("L3"), previous.L3, timestamp),
+            timestamp,
+            get_device_time(device_time),
+        )
+
+    def decode_tasmota_phase(power, previous_phase, timestamp):
+        power = float(power)
+        return PhaseSnapshot(power, power / voltage, voltage, frequency, None, integrate(previous_phase, power, timestamp), timestamp)
+
+    # the power and power_L1-3 values have to be sent within the same second or
+    # power as last one, else on startup the phases are not correctly recognized
+    def decode_tasmota(pv, previous, timestamp):
+        if "power_L1" in pv:
+            L1, L2, L3 = decode_tasmota_phase(pv["power_L1"], previous.L1, timestamp), previous.L2, previous.L3
+        elif "power_L2" in pv:
+            L1, L2, L3 = previous.L1, decode_tasmota_phase(pv["power_L2"], previous.L2, timestamp), previous.L3
+        elif "power_L3" in pv:
+            L1, L2, L3 = previous.L1, previous.L2, decode_tasmota_phase(pv["power_L3"], previous.L3, timestamp)
+        else:
+            return None
+        return PvSnapshot(previous.power, previous.current, previous.voltage, previous.forward, L1, L2, L3, previous.time, previous.device_time)
+
+    def decode_shelly(jsonpayload, previous, timestamp):
+        power = float(jsonpayload.get("apower", 0))
+        power_above_threshold = power > standby_power
+        power = power if power_above_threshold else 0.0
+
+        current = float(jsonpayload.get("current", power / voltage))
+        current = current if power_above_threshold else 0.0
+        phase_voltage = float(jsonpayload.get("voltage", voltage))
+        forward = float(jsonpayload["aenergy"]["total"]) / 1000 if "aenergy" in jsonpayload and "total" in jsonpayload["aenergy"] else integrate(previous, power, timestamp)
+
+        L1 = PhaseSnapshot(
+            power,
+            current,
+            phase_voltage,
+            float(jsonpayload.get("freq", frequency)),
+            float(jsonpayload["pf"]) if "pf" in jsonpayload else None,
+            forward,
+            timestamp,
+        )
+
+        # multi-phase values are cleared
+        return PvSnapshot(power, current, phase_voltage, forward, L1, None, None, timestamp)
+
+    def decode(jsonpayload, previous, timestamp=0.0):
+        if "pv" in jsonpayload:
+            pv = jsonpayload["pv"]
+            if not isinstance(pv, dict):
+                raise PayloadError('Received JSON MQTT message does not include a power object in the pv object. Expected at least: {"pv": {"power": 0.0}}')
+            if "power" in pv:
+                return decode_generic(pv, previous, timestamp, jsonpayload.get("timestamp"))
+            return decode_tasmota(pv, previous, timestamp)
+
+        if "apower" in jsonpayload:
+            return decode_shelly(jsonpayload, previous, timestamp)
+
+        raise PayloadError('Received JSON MQTT message does not include a pv object. Expected at least: {"pv": {"power": 0.0}}')
+
+    return decode
@@ -232,6 +232,30 @@ def wrap_dbus_value(value):
 	return value
 
 
+def _wrap_dbus_int(value):
+	if value is None:
+		return VEDBUS_INVALID
+	try:
+		return dbus.Int32(value, variant_level=1)
+	except OverflowError:
+		return dbus.Int64(value, variant_level=1)
+
+
+_dbus_wrappers = {
+	float: lambda value: VEDBUS_INVALID if value is None else dbus.Double(value, variant_level=1),
+	bool: lambda value: VEDBUS_INVALID if value is None else dbus.Boolean(value, variant_level=1),
+	int: _wrap_dbus_int,
+	str: lambda value: VEDBUS_INVALID if value is None else dbus.String(value, variant_level=1),
+}
+
+
+def get_dbus_wrapper(valuetype):
+	"""Returns a function that wraps values of the given type like wrap_dbus_value, but without the
+	isinstance checks for every value. None is wrapped as invalid. For other types wrap_dbus_value is
+	returned."""
+	return _dbus_wrappers.get(valuetype, wrap_dbus_value)
+
+
 dbus_int_types = (dbus.Int32, dbus.UInt32, dbus.Byte, dbus.Int16, dbus.UInt16, dbus.UInt32, dbus.Int64, dbus.UInt64)
 
 
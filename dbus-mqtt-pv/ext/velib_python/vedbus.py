@@ -7,7 +7,7 @@ import traceback
 import os
 import weakref
 from collections import defaultdict
-from ve_utils import wrap_dbus_value, unwrap_dbus_value
+from ve_utils import wrap_dbus_value, unwrap_dbus_value, get_dbus_wrapper
 
 # vedbus contains three classes:
 # VeDbusItemImport -> use this to read data from the dbus, ie import
@@ -58,13 +58,19 @@ from ve_utils import wrap_dbus_value, unwrap_dbus_value
 
 # Export ourselves as a D-Bus service.
 class VeDbusService(object):
-	def __init__(self, servicename, bus=None, register=True):
+	# @param propertieschanged	when True, changes flushed from a ServiceContext are also emitted as
+	#							PropertiesChanged signal on each item, for consumers not supporting ItemsChanged.
+	# @param signaltext			when False, the signals only contain the Value and not the Text. The Text is
+	#							then only rendered when it is requested with GetText or GetItems.
+	def __init__(self, servicename, bus=None, register=True, propertieschanged=False, signaltext=True):
 		# dict containing the VeDbusItemExport objects, with their path as the key.
 		self._dbusobjects = {}
 		self._dbusnodes = {}
 		self._ratelimiters = []
 		self._dbusname = None
 		self.name = servicename
+		self.propertieschanged = propertieschanged
+		self.signaltext = signaltext
 
 		# dict containing the onchange callbacks, for each object. Object path is the key
 		self._onchangecallbacks = {}
@@ -110,6 +116,8 @@ class VeDbusService(object):
 	# @param callbackonchange	function that will be called when this value is changed. First parameter will
 	#							be the path of the object, second the new value. This callback should return
 	#							True to accept the change, False to reject it.
+	# @param valuetype			type of the value (float, int, bool or str). Values set over D-Bus are cast to
+	#							it and the values are wrapped for D-Bus without checking their type first.
 	def add_path(self, path, value, description="", writeable=False,
 					onchangecallback=None, gettextcallback=None, valuetype=None, itemtype=None):
 
@@ -119,6 +127,8 @@ class VeDbusService(object):
 		itemtype = itemtype or VeDbusItemExport
 		item = itemtype(self._dbusconn, path, value, description, writeable,
 				self._value_changed, gettextcallback, deletecallback=self._item_deleted, valuetype=valuetype)
+		if not self.signaltext:
+			item.signaltext = False
 
 		spl = path.split('/')
 		for i in range(2, len(spl)):
@@ -211,10 +221,16 @@ class ServiceContext(object):
 	def flush(self):
 		if self.changes:
 			self.parent._dbusnodes['/'].ItemsChanged(self.changes)
+			if self.parent.propertieschanged:
+				for path, changes in self.changes.items():
+					self.parent._dbusobjects[path].PropertiesChanged(changes)
 			self.changes.clear()
 
 	def add_path(self, path, value, *args, **kwargs):
 		self.parent.add_path(path, value, *args, **kwargs)
+		if not self.parent.signaltext:
+			self.changes[path] = {'Value': wrap_dbus_value(value)}
+			return
 		self.changes[path] = {
 			'Value': wrap_dbus_value(value),
 			'Text': self.parent._dbusobjects[path].GetText()
@@ -456,7 +472,7 @@ class VeDbusTreeExport(dbus.service.Object):
 			px += '/'
 		for p, item in self._service._dbusobjects.items():
 			if p.startswith(px):
-				v = item.GetText() if get_text else wrap_dbus_value(item.local_get_value())
+				v = item.GetText() if get_text else item.GetValue()
 				r[p[len(px):]] = v
 		logging.debug(r)
 		return r
@@ -482,13 +498,16 @@ class VeDbusRootExport(VeDbusTreeExport):
 	def GetItems(self):
 		return {
 			path: {
-				'Value': wrap_dbus_value(item.local_get_value()),
+				'Value': item.GetValue(),
 				'Text': item.GetText() }
 			for path, item in self._service._dbusobjects.items()
 		}
 
 
 class VeDbusItemExport(dbus.service.Object):
+	# include the Text in the PropertiesChanged and ItemsChanged signals
+	signaltext = True
+
 	## Constructor of VeDbusItemExport
 	#
 	# Use this object to export (publish), values on the dbus
@@ -508,10 +527,14 @@ class VeDbusItemExport(dbus.service.Object):
 		self._onchangecallback = onchangecallback
 		self._gettextcallback = gettextcallback
 		self._value = value
+		# Text of the value, rendered on the first request after the value changed
+		self._text = None
 		self._description = description
 		self._writeable = writeable
 		self._deletecallback = deletecallback
 		self._type = valuetype
+		# wraps the value for D-Bus, without checking its type if the type is declared
+		self._wrap = get_dbus_wrapper(valuetype)
 
 	# To force immediate deregistering of this dbus object, explicitly call __del__().
 	def __del__(self):
@@ -544,8 +567,11 @@ class VeDbusItemExport(dbus.service.Object):
 			return None
 
 		self._value = newvalue
+		self._text = None
+		if not self.signaltext:
+			return {'Value': self._wrap(newvalue)}
 		return {
-			'Value': wrap_dbus_value(newvalue),
+			'Value': self._wrap(newvalue),
 			'Text': self.GetText()
 		}
 
@@ -603,13 +629,18 @@ class VeDbusItemExport(dbus.service.Object):
 	# @return the value when valid, and otherwise an empty array
 	@dbus.service.method('com.victronenergy.BusItem', out_signature='v')
 	def GetValue(self):
-		return wrap_dbus_value(self._value)
+		return self._wrap(self._value)
 
 	## Dbus exported method GetText
 	# Returns the value as string of the dbus-object-path.
 	# @return text A text-value. '---' when local value is invalid
 	@dbus.service.method('com.victronenergy.BusItem', out_signature='s')
 	def GetText(self):
+		if self._text is None:
+			self._text = self._get_text()
+		return self._text
+
+	def _get_text(self):
 		if self._value is None:
 			return '---'
 
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+# Ingest policies, which reduce the messages of devices publishing faster than the D-Bus is updated.
+#
+# The policy of a device decides in the MQTT callback, before the payload is parsed, which messages
+# are decoded:
+#   latest      only the newest message of every interval is decoded, the others are dropped
+#   every_nth   only every n-th message is decoded
+#   average     all messages are decoded, but only the average power and current of every interval is
+#               handed over, so this saves only the handover and publishing, not the parsing
+#
+# The policies need the full state in every message, so they cannot be used with Tasmota, which
+# sends every phase in a separate message on the same topic.
+#
+# accept() and aggregate() run in the MQTT thread, take_held() and take_aggregate() in the GLib
+# thread, so that the last message is not held back, if the device stops publishing.
+
+import threading
+
+from decoder import PhaseSnapshot, PvSnapshot
+
+
+class IngestPolicy:
+    """Decodes every message. Base class of the other policies."""
+
+    def __init__(self):
+        # messages received, decoded, dropped before decoding and decoded but combined into an average
+        self.received = 0
+        self.decoded = 0
+        self.dropped = 0
+        self.aggregated = 0
+
+    def accept(self, msg):
+        """Return ``True``, if the message is decoded now."""
+        self.received += 1
+        self.decoded += 1
+        return True
+
+    def aggregate(self, snapshot, timestamp):
+        """Return the snapshot to hand over, or ``None`` if nothing is handed over now."""
+        return snapshot
+
+    @property
+    def pending(self):
+        """Number of messages held back or combined into an average, which was not handed over yet."""
+        return 0
+
+    def take_held(self, now):
+        """Return a held message, which has to be decoded now, or ``None``."""
+        return None
+
+    def take_aggregate(self, now):
+        """Return an aggregated snapshot, which has to be handed over now, or ``None``."""
+        return None
+
+
+class LatestPolicy(IngestPolicy):
+    def __init__(self, interval):
+        """:param interval: seconds"""
+        super().__init__()
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._held = None
+        self._decoded_time = None
+
+    def accept(self, msg):
+        with self._lock:
+            self.received += 1
+            if self._decoded_time is None or msg.timestamp - self._decoded_time >= self.interval:
+                # the held message is older than this one
+                if self._held is not None:
+                    self._held = None
+                    self.dropped += 1
+                self._decoded_time = msg.timestamp
+                self.decoded += 1
+                return True
+
+            if self._held is not None:
+                self.dropped += 1
+            self._held = msg
+            return False
+
+    @property
+    def pending(self):
+        return 1 if self._held is not None else 0
+
+    def take_held(self, now):
+        with self._lock:
+            if self._held is None or now - self._decoded_time < self.interval:
+                return None
+            msg = self._held
+            self._held = None
+            self._decoded_time = now
+            self.decoded += 1
+            return msg
+
+
+class EveryNthPolicy(IngestPolicy):
+    def __init__(self, n):
+        super().__init__()
+        self.n = n
+
+    def accept(self, msg):
+        self.received += 1
+        if (self.received - 1) % self.n == 0:
+            self.decoded += 1
+            return True
+        self.dropped += 1
+        return False
+
+
+class AveragePolicy(IngestPolicy):
+    def __init__(self, interval):
+        """:param interval: seconds"""
+        super().__init__()
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._start = None
+        self._last = None
+        self._count = 0
+        # sums of power and current of the total and the phases
+        self._sums = [0.0] * 8
+
+    def aggregate(self, snapshot, timestamp):
+        with self._lock:
+            if self._start is None:
+                self._start = timestamp
+            self._last = snapshot
+            self._count += 1
+            for i, value in enumerate((snapshot, snapshot.L1, snapshot.L2, snapshot.L3)):
+                if value is not None and value.power is not None:
+                    self._sums[i * 2] += value.power
+                    self._sums[i * 2 + 1] += value.current if value.current is not None else 0.0
+
+            if timestamp - self._start < self.interval:
+                self.aggregated += 1
+                return None
+            return self._average()
+
+    @property
+    def pending(self):
+        return self._count
+
+    def take_aggregate(self, now):
+        with self._lock:
+            if self._start is None or now - self._start < self.interval:
+                return None
+            return self._average()
+
+    def _average(self):
+        # the other values are taken from the last snapshot of the interval
+        last = self._last
+        count = self._count
+        sums = self._sums
+        phases = [
+            PhaseSnapshot(sums[i * 2] / count, sums[i * 2 + 1] / count, phase.voltage, phase.frequency, phase.power_factor, phase.forward, phase.time) if phase is not None else None
+            for i, phase in ((1, last.L1), (2, last.L2), (3, last.L3))
+        ]
+        snapshot = PvSnapshot(sums[0] / count if last.power is not None else None, sums[1] / count, last.voltage, last.forward, phases[0], phases[1], phases[2], last.time, last.device_time)
+
+        self._start = None
+        self._last = None
+        self._count = 0
+        self._sums = [0.0] * 8
+        return snapshot
+
+
+def get_policy(section):
+    """Return the ingest policy configured in a config section, or ``None`` if every message is decoded."""
+    name = section.get("ingest", "all")
+    if name == "latest":
+        return LatestPolicy(int(section.get("ingest_interval", "1000")) / 1000)
+    if name == "every_nth":
+        return EveryNthPolicy(int(section.get("ingest_nth", "5")))
+    if name == "average":
+        return AveragePolicy(int(section.get("ingest_interval", "1000")) / 1000)
+    if name == "all":
+        return None
+    raise ValueError('Unknown ingest policy "%s"' % name)
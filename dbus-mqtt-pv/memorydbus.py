@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+
+# In-memory transport for VeDbusService from velib_python.
+#
+# MemoryBus takes the place of the D-Bus connection: the objects of VeDbusService and VeDbusItemExport are
+# exported on it and the PropertiesChanged and ItemsChanged signals are counted, and recorded if requested,
+# instead of being sent to a D-Bus daemon. So the real VeDbusService runs without a D-Bus daemon, like in the
+# benchmarks, including the wrapping of the values for D-Bus and with dbus-python also the marshalling of
+# the signals.
+#
+# If dbus-python is not installed, a minimal stand-in of the dbus module is installed first, which has the
+# same value types (dbus.Double, dbus.Int32, ...), so the values are still wrapped like on D-Bus. The
+# velib_python folder has to be in sys.path.
+
+import logging
+import sys
+import weakref
+from types import ModuleType
+
+# same as DBUS_REQUEST_NAME_REPLY_PRIMARY_OWNER and DBUS_REQUEST_NAME_REPLY_EXISTS
+PRIMARY_OWNER = 1
+NAME_EXISTS = 3
+
+
+class MemoryBus:
+    """Replaces the D-Bus connection of a VeDbusService.
+
+    :param record: keep the sent signals in ``signals`` as ``(signal, path, changes)``. The signals are
+        counted in ``signal_counts`` in any case.
+    """
+
+    def __init__(self, record=False):
+        self.objects = {}
+        self.names = set()
+        self.record = record
+        self.signals = []
+        self.signal_counts = {"PropertiesChanged": 0, "ItemsChanged": 0}
+        # number of path changes sent with all signals
+        self.changes = 0
+        # used by dbus.service.BusName
+        self._bus_names = weakref.WeakValueDictionary()
+
+    def _register_object_path(self, path, on_message, on_unregister=None, fallback=False):
+        if path in self.objects:
+            raise KeyError("Can't register the object-path handler for '%s': there is already a handler" % path)
+        self.objects[path] = on_message
+
+    def _unregister_object_path(self, path):
+        del self.objects[path]
+
+    def request_name(self, name, flags=0):
+        if name in self.names:
+            return NAME_EXISTS
+        self.names.add(name)
+        return PRIMARY_OWNER
+
+    def release_name(self, name):
+        self.names.discard(name)
+
+    def send_message(self, message):
+        signal = message.get_member()
+        self.signal_counts[signal] += 1
+        changes = message.get_args_list()[0]
+        self.changes += len(changes) if signal == "ItemsChanged" else 1
+        if self.record:
+            # the changes of a ServiceContext are cleared after the signal was sent
+            self.signals.append((signal, message.get_path(), dict(changes)))
+        return 0
+
+
+def _variant(name, base):
+    def __new__(cls, value=base(), variant_level=0):
+        self = base.__new__(cls, value)
+        self.variant_level = variant_level
+        return self
+
+    def __repr__(self):
+        return "dbus.%s(%s)" % (name, base.__repr__(self))
+
+    return type(name, (base,), {"__new__": __new__, "__repr__": __repr__})
+
+
+def _integer(name, bits, signed=True):
+    low, high = (-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if signed else (0, (1 << bits) - 1)
+    variant = _variant(name, int)
+
+    def __new__(cls, value=0, variant_level=0):
+        if not low <= value <= high:
+            raise OverflowError("Value %r out of range for %s" % (value, name))
+        return variant.__new__(cls, value, variant_level)
+
+    return type(name, (variant,), {"__new__": __new__})
+
+
+class _Container:
+    def __init__(self, value=(), signature=None, variant_level=0):
+        super().__init__(value)
+        self.signature = signature
+        self.variant_level = variant_level
+
+
+class _Object:
+    """Replaces dbus.service.Object, the object is exported on the MemoryBus."""
+
+    def __init__(self, conn=None, object_path=None, bus_name=None):
+        self._locations = []
+        if conn is not None and object_path is not None:
+            self.add_to_connection(conn, object_path)
+
+    @property
+    def __dbus_object_path__(self):
+        if not self._locations:
+            raise AttributeError("%r is not exported at any object path" % self)
+        return self._locations[0][1]
+
+    @property
+    def locations(self):
+        return iter(self._locations)
+
+    def add_to_connection(self, connection, path):
+        connection._register_object_path(path, self._message_cb, self._unregister_cb)
+        self._locations.append((connection, path, False))
+
+    def remove_from_connection(self, connection=None, path=None):
+        for location in list(self._locations):
+            if (connection is None or location[0] is connection) and (path is None or location[1] == path):
+                location[0]._unregister_object_path(location[1])
+                self._locations.remove(location)
+
+    def _message_cb(self, connection, message):
+        pass
+
+    def _unregister_cb(self, connection):
+        pass
+
+
+class _SignalMessage:
+    """Replaces dbus.lowlevel.SignalMessage, the arguments are not marshalled."""
+
+    def __init__(self, path, interface, member, args):
+        self._path = path
+        self._interface = interface
+        self._member = member
+        self._args = list(args)
+
+    def get_path(self):
+        return self._path
+
+    def get_interface(self):
+        return self._interface
+
+    def get_member(self):
+        return self._member
+
+    def get_args_list(self):
+        return self._args
+
+
+def _method(dbus_interface=None, in_signature=None, out_signature=None, **kwargs):
+    def decorator(func):
+        func._dbus_is_method = True
+        func._dbus_interface = dbus_interface
+        return func
+
+    return decorator
+
+
+def _signal(dbus_interface, signature=None, **kwargs):
+    def decorator(func):
+        member = func.__name__
+
+        def emit_signal(self, *args):
+            func(self, *args)
+            for connection, path, fallback in self.locations:
+                connection.send_message(_SignalMessage(path, dbus_interface, member, args))
+
+        emit_signal.__name__ = member
+        emit_signal._dbus_is_signal = True
+        emit_signal._dbus_interface = dbus_interface
+        return emit_signal
+
+    return decorator
+
+
+class _BusName:
+    """Replaces dbus.service.BusName."""
+
+    def __new__(cls, name, bus=None, allow_replacement=False, replace_existing=False, do_not_queue=False):
+        if name in bus._bus_names:
+            return bus._bus_names[name]
+        if bus.request_name(name) != PRIMARY_OWNER:
+            raise _exceptions.NameExistsException(name)
+        bus_name = object.__new__(cls)
+        bus_name._bus = bus
+        bus_name._name = name
+        bus._bus_names[name] = bus_name
+        return bus_name
+
+    def get_bus(self):
+        return self._bus
+
+    def get_name(self):
+        return self._name
+
+    def __del__(self):
+        self._bus.release_name(self._name)
+
+
+class _DBusException(Exception):
+    pass
+
+
+class _NameExistsException(_DBusException):
+    def __init__(self, name):
+        super().__init__("Bus name already exists: %s" % name)
+
+
+_exceptions = ModuleType("dbus.exceptions")
+_exceptions.DBusException = _DBusException
+_exceptions.NameExistsException = _NameExistsException
+
+
+def install_dbus_types():
+    """Installs the stand-in of the dbus module, if dbus-python is not installed."""
+    try:
+        import dbus.service  # noqa: F401
+
+        return
+    except ImportError:
+        pass
+
+    service = ModuleType("dbus.service")
+    service.Object = _Object
+    service.BusName = _BusName
+    service.method = _method
+    service.signal = _signal
+
+    dbus = ModuleType("dbus")
+    dbus.__path__ = []
+    dbus.service = service
+    dbus.exceptions = _exceptions
+    dbus.DBusException = _DBusException
+    dbus.SessionBus = dbus.SystemBus = lambda private=False: MemoryBus()
+    dbus.add_signal_receiver = lambda *args, **kwargs: None
+    dbus.Double = _variant("Double", float)
+    dbus.String = _variant("String", str)
+    dbus.Signature = _variant("Signature", str)
+    dbus.ObjectPath = _variant("ObjectPath", str)
+    dbus.ByteArray = _variant("ByteArray", bytes)
+    # bool can not be subclassed, dbus.Boolean is an int too
+    dbus.Boolean = _integer("Boolean", 1, signed=False)
+    dbus.Byte = _integer("Byte", 8, signed=False)
+    dbus.Int16 = _integer("Int16", 16)
+    dbus.UInt16 = _integer("UInt16", 16, signed=False)
+    dbus.Int32 = _integer("Int32", 32)
+    dbus.UInt32 = _integer("UInt32", 32, signed=False)
+    dbus.Int64 = _integer("Int64", 64)
+    dbus.UInt64 = _integer("UInt64", 64, signed=False)
+    dbus.Array = type("Array", (_Container, list), {})
+    dbus.Dictionary = type("Dictionary", (_Container, dict), {})
+
+    sys.modules["dbus"] = dbus
+    sys.modules["dbus.service"] = service
+    sys.modules["dbus.exceptions"] = _exceptions
+    logging.debug("dbus-python is not installed, using the in-memory stand-in")
+
+
+install_dbus_types()
+
+from vedbus import VeDbusService  # noqa: E402
+
+
+class MemoryDbusService(VeDbusService):
+    """VeDbusService on a MemoryBus, see the module description.
+
+    :param record: keep the sent signals in ``signals``, see MemoryBus
+    """
+
+    def __init__(self, servicename, bus=None, register=True, propertieschanged=False, record=False, signaltext=True):
+        super().__init__(servicename, bus or MemoryBus(record), register, propertieschanged, signaltext)
+
+    @property
+    def registered(self):
+        return self._dbusname is not None
+
+    @property
+    def signals(self):
+        return self._dbusconn.signals
+
+    @property
+    def signal_counts(self):
+        return self._dbusconn.signal_counts
+
+    @property
+    def changes(self):
+        return self._dbusconn.changes
+
+    def GetItems(self):
+        return self._dbusnodes["/"].GetItems()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+# Metrics of the driver internals in the Prometheus text format, served over HTTP on localhost.
+#
+# The counters are kept as plain attributes of the devices, services and the reconnector and are
+# only read when the metrics are scraped, so the MQTT and GLib threads do not pay for the metrics.
+# The HTTP server runs in its own daemon thread.
+#
+#   curl http://127.0.0.1:9116/metrics  (with "metrics_port = 9116" in the config.ini)
+
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from reconnect import STATE_CONNECTED
+
+PREFIX = "dbus_mqtt_pv_"
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def get_metrics(devices, services, reconnector=None, checkpoint=None):
+    """Return the metrics of the PvDevice list, the DbusMqttPvService list, the Reconnector and the Checkpoint as Prometheus text.
+
+    The counters of the devices are exported for every configured device, also before its service is registered.
+    """
+    metrics = []
+
+    def add(name, kind, description, samples):
+        metrics.append("# HELP %s%s %s" % (PREFIX, name, description))
+        metrics.append("# TYPE %s%s %s" % (PREFIX, name, kind))
+        for labels, value in samples:
+            labels = "{" + ",".join('%s="%s"' % (key, _label(label)) for key, label in labels) + "}" if labels else ""
+            metrics.append("%s%s%s %s" % (PREFIX, name, labels, repr(value) if isinstance(value, float) else value))
+
+    registered = {service.device for service in services}
+    labeled = [(device, (("topic", device.topic),)) for device in devices]
+    services = [(service, (("topic", service.device.topic),)) for service in services]
+
+    add("registered", "gauge", "1 if the D-Bus service of the device is registered", [(labels, 1 if device in registered else 0) for device, labels in labeled])
+    add("messages_received_total", "counter", "MQTT messages received", [(labels, device.received) for device, labels in labeled])
+    add("messages_decoded_total", "counter", "MQTT messages parsed and decoded", [(labels, device.decoded_count) for device, labels in labeled])
+    add(
+        "parse_errors_total",
+        "counter",
+        "MQTT messages, which could not be decoded, by error type",
+        [(labels + (("type", error),), count) for device, labels in labeled for error, count in device.errors.items()],
+    )
+    add(
+        "duplicates_skipped_total",
+        "counter",
+        "MQTT messages with the same payload as the previous one, which were not decoded",
+        [(labels, device.duplicates) for device, labels in labeled],
+    )
+    add("ingest_dropped_total", "counter", "MQTT messages dropped by the ingest policy", [(labels, device.ingest.dropped if device.ingest else 0) for device, labels in labeled])
+    add("ingest_aggregated_total", "counter", "MQTT messages combined into an average by the ingest policy", [(labels, device.ingest.aggregated if device.ingest else 0) for device, labels in labeled])
+    add("decode_seconds", "gauge", "Duration of the last decode", [(labels, device.decode_time) for device, labels in labeled])
+    add("decode_seconds_total", "counter", "Time spent decoding", [(labels, device.decode_time_total) for device, labels in labeled])
+    add("queue_depth", "gauge", "Messages and snapshots received, but not yet published on D-Bus", [(labels, service.queue_depth) for service, labels in services])
+    add("dbus_signals_total", "counter", "ItemsChanged signals emitted on D-Bus", [(labels, service.signals) for service, labels in services])
+    add("dbus_changes_total", "counter", "Changed paths emitted on D-Bus", [(labels, service.changes) for service, labels in services])
+    add("publish_seconds", "gauge", "Duration of the last publish cycle", [(labels, service.publish_time) for service, labels in services])
+    add("publish_seconds_total", "counter", "Time spent in publish cycles", [(labels, service.publish_time_total) for service, labels in services])
+    deadbands = [(service, labels) for service, labels in services if service.deadband is not None]
+    if deadbands:
+        add("deadband_passed_total", "counter", "Changes published, since they exceeded the deadband", [(labels, service.deadband.passed) for service, labels in deadbands])
+        add("deadband_suppressed_total", "counter", "Changes within the deadband, which were not published", [(labels, service.deadband.suppressed) for service, labels in deadbands])
+        add("deadband_suppression_ratio", "gauge", "Part of the changes within the deadband", [(labels, service.deadband.suppression_ratio) for service, labels in deadbands])
+    add("timeouts_total", "counter", "Timeouts without a new MQTT message", [(labels, service.timeouts) for service, labels in services])
+    if reconnector is not None:
+        add("reconnects_total", "counter", "Successful reconnects to the MQTT broker", [((), reconnector.reconnects)])
+        add("connected", "gauge", "1 if connected to the MQTT broker", [((), 1 if reconnector.state == STATE_CONNECTED else 0)])
+    if checkpoint is not None:
+        add("checkpoint_writes_total", "counter", "Writes of the checkpoint file", [((), checkpoint.writes)])
+        add("checkpoint_bytes_written_total", "counter", "Bytes written to the checkpoint file", [((), checkpoint.bytes_written)])
+
+    return "\n".join(metrics) + "\n"
+
+
+class MetricsServer:
+    def __init__(self, address, port, devices, services, reconnector=None, checkpoint=None):
+        """
+        :param devices: all configured PvDevice
+        :param services: the registered DbusMqttPvService, which can grow while the server runs
+        """
+        self.devices = devices
+        self.services = services
+        self.reconnector = reconnector
+        self.checkpoint = checkpoint
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = get_metrics(server.devices, server.services, server.reconnector, server.checkpoint).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # the scrapes would fill the log
+                pass
+
+        self._httpd = ThreadingHTTPServer((address, port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, name="metrics", daemon=True).start()
+        logging.info("Metrics: Serving on http://%s:%i/metrics" % self._httpd.server_address[:2])
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
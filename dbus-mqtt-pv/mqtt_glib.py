@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# Runs the network I/O of a paho MQTT client in the GLib.MainLoop() instead of paho's own thread.
+#
+# The MQTT socket is watched with GLib.io_add_watch() and paho's loop_read(), loop_write() and
+# loop_misc() are called from the main loop, so the MQTT callbacks run on the same thread as the
+# D-Bus service.
+
+from gi.repository import GLib  # pyright: ignore[reportMissingImports]
+
+
+class GLibMqttLoop:
+    def __init__(self, client):
+        self._client = client
+        self._read_source = None
+        self._write_source = None
+        self._misc_source = None
+
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    def start(self):
+        # loop_misc() sends the keepalive pings and detects a lost connection
+        if self._misc_source is None:
+            self._misc_source = GLib.timeout_add_seconds(1, self._loop_misc)
+
+    def stop(self):
+        for source in (self._read_source, self._write_source, self._misc_source):
+            if source is not None:
+                GLib.source_remove(source)
+        self._read_source = self._write_source = self._misc_source = None
+
+    def _on_socket_open(self, client, userdata, sock):
+        self._read_source = GLib.io_add_watch(sock.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN | GLib.IO_ERR | GLib.IO_HUP, self._loop_read)
+
+    def _on_socket_close(self, client, userdata, sock):
+        if self._read_source is not None:
+            GLib.source_remove(self._read_source)
+            self._read_source = None
+        self._on_socket_unregister_write(client, userdata, sock)
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        if self._write_source is None:
+            self._write_source = GLib.io_add_watch(sock.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_OUT | GLib.IO_ERR | GLib.IO_HUP, self._loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        if self._write_source is not None:
+            GLib.source_remove(self._write_source)
+            self._write_source = None
+
+    def _loop_read(self, fd, condition):
+        self._client.loop_read()
+
+        # a TLS socket can hold already received data, which does not wake up the watch again
+        sock = self._client.socket()
+        while sock is not None and hasattr(sock, "pending") and sock.pending() > 0:
+            self._client.loop_read()
+            sock = self._client.socket()
+
+        # the watch was removed in _on_socket_close(), if the connection was closed while reading
+        return True
+
+    def _loop_write(self, fd, condition):
+        self._client.loop_write()
+        return True
+
+    def _loop_misc(self):
+        self._client.loop_misc()
+        return True
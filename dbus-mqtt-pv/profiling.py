@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+# Profiling of the running driver, triggered by signals, so that it does not need to be restarted.
+#
+#   kill -USR1 <pid>    starts cProfile, a second signal stops it and writes the results
+#   kill -USR2 <pid>    starts tracemalloc, every further signal writes a snapshot with the largest
+#                       allocations and the growth since the first snapshot
+#
+# Both stop by themselves after max_duration seconds, since they slow down the driver. Before Python
+# 3.12 cProfile only profiles the thread it is enabled in, so the GLib.MainLoop() is profiled with one
+# profiler and paho's network thread with a second one, which the thread enables and disables itself
+# between two iterations of its loop. So the network I/O, the packet handling and the MQTT callbacks
+# are profiled. The results of both are merged. Since Python 3.12 one profiler sees all threads. The
+# files are written to the given directory, like:
+#   profile-20250101-120000.prof    load with pstats or snakeviz
+#   profile-20250101-120000.txt     the functions with the highest cumulative time
+#   memory-20250101-120000.txt      the largest allocations and the growth
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from time import strftime
+
+# lines written to the text files
+TOP_LINES = 50
+
+# cProfile uses sys.monitoring since Python 3.12, which profiles all threads, but allows only one profiler
+PER_THREAD = sys.version_info < (3, 12)
+
+# seconds to wait for paho's thread to hand over its profiler, its loop returns at least every second
+THREAD_STOP_TIMEOUT = 2
+
+
+class Profiler:
+    def __init__(self, directory, max_duration=300, scheduler=None):
+        """
+        :param directory: where the results are written, created if missing
+        :param max_duration: seconds after which the profiling and the memory tracing stop by themselves
+        :param scheduler: provides ``timeout_add(milliseconds, callback)``, like the GLib module
+        """
+        self.directory = directory
+        self.max_duration = max_duration
+        self._scheduler = scheduler
+
+        self._lock = threading.Lock()
+        self._main = None
+        # session to profile in paho's thread, 0 if none
+        self._thread_session = 0
+        # paho's thread has enabled its profiler for the current session
+        self._thread_running = False
+        # (session, profiler) handed over by paho's thread after it stopped profiling
+        self._thread_profile = None
+        self._thread_stopped = threading.Event()
+        # counts the sessions, so that the timeout of an already stopped session does not stop the next one
+        self._profile_session = 0
+        self._memory_session = 0
+        self._memory_baseline = None
+
+    def wrap_loop(self, loop):
+        """Return the loop function of paho's network thread (``Client._loop()``), which profiles the thread
+        while the profiling runs. Has to be installed before ``loop_start()``."""
+        if not PER_THREAD:
+            return loop
+
+        profile = None
+        session = 0
+
+        def profiled(*args, **kwargs):
+            nonlocal profile, session
+            requested = self._thread_session
+            if profile is not None and session != requested:
+                profile.disable()
+                with self._lock:
+                    self._thread_profile = (session, profile)
+                    self._thread_stopped.set()
+                profile = None
+            if profile is None and requested:
+                with self._lock:
+                    if self._thread_session == requested:
+                        self._thread_running = True
+                        session = requested
+                        profile = cProfile.Profile()
+                        profile.enable()
+            return loop(*args, **kwargs)
+
+        return profiled
+
+    def _filename(self, prefix, extension):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, prefix + strftime("-%Y%m%d-%H%M%S") + extension)
+
+    def _stop_later(self, callback, session):
+        if self._scheduler is not None and self.max_duration > 0:
+            self._scheduler.timeout_add(int(self.max_duration * 1000), lambda: callback(session))
+
+    def toggle_profile(self):
+        """Signal handler of SIGUSR1, has to be called in the thread of the GLib.MainLoop()."""
+        if self._main is None:
+            self._profile_session += 1
+            with self._lock:
+                self._thread_session = self._profile_session
+                self._thread_running = False
+                self._thread_profile = None
+                self._thread_stopped.clear()
+            self._main = cProfile.Profile()
+            self._main.enable()
+            logging.warning("Profiling: Started, stops after %i seconds or with the next SIGUSR1" % self.max_duration)
+            self._stop_later(self._stop_profile, self._profile_session)
+        else:
+            self._stop_profile(self._profile_session)
+        return True
+
+    def _stop_profile(self, session):
+        if self._main is None or session != self._profile_session:
+            return False
+
+        self._main.disable()
+        stats = pstats.Stats(self._main)
+        self._main = None
+
+        # paho's thread disables its profiler itself, at the next iteration of its loop
+        with self._lock:
+            self._thread_session = 0
+            running = self._thread_running
+        if running and not self._thread_stopped.wait(THREAD_STOP_TIMEOUT):
+            logging.warning("Profiling: The MQTT thread did not stop profiling, its results are missing")
+        with self._lock:
+            handover, self._thread_profile = self._thread_profile, None
+            self._thread_running = False
+        if handover is not None and handover[0] == session and handover[1].getstats():
+            stats.add(handover[1])
+
+        try:
+            filename = self._filename("profile", ".prof")
+            stats.dump_stats(filename)
+            text = io.StringIO()
+            pstats.Stats(filename, stream=text).sort_stats("cumulative").print_stats(TOP_LINES)
+            with open(filename[: -len(".prof")] + ".txt", "w") as f:
+                f.write(text.getvalue())
+        except OSError as e:
+            logging.error("Profiling: The results could not be written: %s" % e)
+            return False
+
+        logging.warning('Profiling: Stopped, results written to "%s"' % filename)
+        return False
+
+    def snapshot_memory(self):
+        """Signal handler of SIGUSR2, starts tracemalloc or writes a snapshot."""
+        if not tracemalloc.is_tracing():
+            self._memory_session += 1
+            tracemalloc.start(10)
+            self._memory_baseline = tracemalloc.take_snapshot()
+            logging.warning("Profiling: Memory tracing started, the next SIGUSR2 writes a snapshot. Stops after %i seconds" % self.max_duration)
+            self._stop_later(self._stop_memory, self._memory_session)
+        else:
+            self._write_memory()
+        return True
+
+    def _stop_memory(self, session):
+        if tracemalloc.is_tracing() and session == self._memory_session:
+            self._write_memory()
+            tracemalloc.stop()
+            self._memory_baseline = None
+            logging.warning("Profiling: Memory tracing stopped")
+        return False
+
+    def _write_memory(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+        current, peak = tracemalloc.get_traced_memory()
+
+        lines = ["Traced memory: %i bytes, peak %i bytes" % (current, peak), "", "Largest allocations:"]
+        lines += [str(stat) for stat in snapshot.statistics("lineno")[:TOP_LINES]]
+        lines += ["", "Growth since tracing started:"]
+        lines += [str(stat) for stat in snapshot.compare_to(self._memory_baseline, "lineno")[:TOP_LINES]]
+
+        try:
+            filename = self._filename("memory", ".txt")
+            with open(filename, "w") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logging.error("Profiling: The memory snapshot could not be written: %s" % e)
+            return
+
+        logging.warning('Profiling: Memory snapshot written to "%s"' % filename)
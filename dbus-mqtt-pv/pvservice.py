@@ -0,0 +1,638 @@
+#!/usr/bin/env python
+
+# Pipeline from the received MQTT messages to the D-Bus service of a device.
+#
+# This module does not import dbus or gi, so that the pipeline can also run without a D-Bus and
+# without a GLib.MainLoop(), like in the benchmarks. The VeDbusService and the scheduler (the GLib
+# module in the driver) are passed in by the caller.
+
+import logging
+import platform
+import sys
+import threading
+from time import monotonic, perf_counter, time
+
+from checkpoint import restore_snapshot
+from decoder import EMPTY_SNAPSHOT, PHASES, PayloadError, build_decoder, json_loads
+from ingest import get_policy
+from ratelimit import RateLimiter
+from stats import RollingPercentiles, RollingStats, get_window_name
+
+
+class PvDevice:
+    """A PV inverter, which receives its data from one MQTT topic and is published as one D-Bus service."""
+
+    def __init__(self, name, instance, topic, max_power, position, voltage, frequency, standby_power, energy_integration=True, energy_integration_max_gap=60, ingest=None, skip_duplicates=True):
+        self.name = name
+        self.instance = instance
+        self.topic = topic
+        self.max_power = max_power
+        self.position = position
+
+        # build the payload decoder once, so that config values are not looked up for every message
+        self.decode = build_decoder(voltage=voltage, frequency=frequency, standby_power=standby_power, energy_integration=energy_integration, max_gap=energy_integration_max_gap)
+        self.snapshot = EMPTY_SNAPSHOT
+
+        # last decoded snapshot, which differs from the handed over snapshot, if the ingest policy averages
+        self.decoded = EMPTY_SNAPSHOT
+
+        # IngestPolicy, which drops or averages messages before they are handed over, or None
+        self.ingest = ingest
+
+        # repeated identical payloads are not decoded again, but at least every half integration gap,
+        # so that the energy calculated from a constant power is not dropped as a gap. The time of the
+        # last skipped duplicate is integrated before the next decode, so that the next different
+        # payload is not averaged over all skipped messages
+        self.skip_duplicates = skip_duplicates
+        self.duplicate_max_age = energy_integration_max_gap / 2
+        self.payload = None
+        self.jsonpayload = None
+        self.duplicate_time = None
+        self.duplicates = 0
+
+        # counters and the duration of the last decode in seconds, for the metrics
+        self.received = 0
+        self.decoded_count = 0
+        self.errors = {"empty": 0, "payload": 0, "type": 0, "json": 0, "exception": 0}
+        self.decode_time = 0.0
+        self.decode_time_total = 0.0
+
+        # serializes the decoding, held messages of the ingest policy are decoded in the GLib thread
+        self.lock = threading.Lock()
+
+        # called from the MQTT thread after a new snapshot was handed over
+        self.on_snapshot = None
+
+        # set as soon as the first snapshot with values was handed over, then on_first_data is called from the MQTT thread
+        self.first_data = threading.Event()
+        self.on_first_data = None
+
+        # energy values from the checkpoint {channel: kWh}, which are not yet restored
+        self.restored = None
+
+        # power statistics of every decoded message, by channel: [time of the last sample, [RollingStats, ...]]
+        # set by the service, read and written with the lock held
+        self.stats = None
+
+        self.last_changed = int(time())
+
+    def handover(self, snapshot):
+        # hand over all values of the message with a single reference assignment
+        self.snapshot = snapshot
+        if not self.first_data.is_set() and snapshot.power is not None:
+            self.first_data.set()
+            if self.on_first_data is not None:
+                self.on_first_data()
+        if self.on_snapshot is not None:
+            self.on_snapshot()
+
+    def add_stats(self, snapshot):
+        for channel, value in zip(STATS_CHANNELS, (snapshot, snapshot.L1, snapshot.L2, snapshot.L3)):
+            # add a sample only for new values, the phases of Tasmota are received in separate messages
+            channel_stats = self.stats[channel]
+            if value is None or value.power is None or value.time == channel_stats[0]:
+                continue
+            channel_stats[0] = value.time
+            for stats in channel_stats[1]:
+                stats.add(value.time, value.power)
+
+    def flush(self, now):
+        """Hand over the messages held back by the ingest policy, if its interval passed. Called before publishing."""
+        if self.ingest is None:
+            return
+        msg = self.ingest.take_held(now)
+        if msg is not None:
+            handle_message(self, msg, held=True)
+        snapshot = self.ingest.take_aggregate(now)
+        if snapshot is not None:
+            with self.lock:
+                self.handover(snapshot)
+
+
+def get_device(config, section):
+    # settings missing in the section are taken from the [PV] section
+    return PvDevice(
+        name=section["device_name"],
+        instance=int(section["device_instance"]),
+        topic=section["topic"],
+        max_power=int(section.get("max", config["PV"]["max"])),
+        position=int(section.get("position", config["PV"]["position"])),
+        voltage=section["voltage"],
+        frequency=section["frequency"],
+        standby_power=section.get("standby_power", config["PV"].get("standby_power", "0")),
+        energy_integration=section.get("energy_integration", "1") == "1",
+        energy_integration_max_gap=float(section.get("energy_integration_max_gap", "60")),
+        ingest=get_policy(section),
+        skip_duplicates=section.get("skip_duplicates", "1") == "1",
+    )
+
+
+def get_devices(config):
+    """Return the list of PvDevice configured in the ``config.ini``.
+
+    Every section starting with DEVICE is a device, else the single device configured in the [DEFAULT],
+    [PV] and [MQTT] section is used. Raises ``KeyError`` or ``ValueError`` on invalid settings.
+    """
+    device_sections = [section for section in config.sections() if section.startswith("DEVICE")]
+    if device_sections:
+        return [get_device(config, config[section]) for section in device_sections]
+    return [get_device(config, config["MQTT"])]
+
+
+def on_message(client, userdata, msg):
+    # userdata is the dict {topic: PvDevice} of all devices
+    device = userdata.get(msg.topic)
+    if device is not None:
+        handle_message(device, msg)
+
+
+def handle_message(device, msg, held=False):
+    """Decode a message of a device and hand over the new snapshot.
+
+    :param held: the message was held back by the ingest policy and is not checked again
+    """
+    try:
+
+        # get JSON from topic
+        if not held:
+            device.received += 1
+
+        if msg.payload != "" and msg.payload != b"":
+            # also duplicates and messages dropped by the ingest policy show that the device is alive
+            device.last_changed = int(time())
+
+            if not held and device.skip_duplicates:
+                # comparing the bytes is much cheaper than parsing them
+                if msg.payload == device.payload and device.decoded.time is not None and msg.timestamp - device.decoded.time < device.duplicate_max_age:
+                    device.duplicates += 1
+                    device.duplicate_time = msg.timestamp
+                    return
+
+            if not held and device.ingest is not None and not device.ingest.accept(msg):
+                return
+
+            start = perf_counter()
+            jsonpayload = json_loads(msg.payload)
+
+            with device.lock:
+                # a held message is decoded in the GLib thread and could be older than one decoded meanwhile
+                if held and device.decoded.time is not None and msg.timestamp < device.decoded.time:
+                    return
+
+                if device.duplicate_time is not None:
+                    # decode the last skipped duplicate, so that its power is integrated up to its time
+                    if device.duplicate_time < msg.timestamp:
+                        device.decoded = device.decode(device.jsonpayload, device.decoded, device.duplicate_time) or device.decoded
+                    device.duplicate_time = None
+
+                snapshot = device.decode(jsonpayload, device.decoded, msg.timestamp)
+                device.decode_time = perf_counter() - start
+                device.decode_time_total += device.decode_time
+                device.decoded_count += 1
+                if snapshot is not None:
+                    if device.restored:
+                        snapshot = restore_snapshot(snapshot, device.restored, device.topic)
+                    device.decoded = snapshot
+                    device.payload = msg.payload
+                    if device.stats is not None:
+                        device.add_stats(snapshot)
+                    device.jsonpayload = jsonpayload
+
+                    if device.ingest is not None:
+                        snapshot = device.ingest.aggregate(snapshot, msg.timestamp)
+                    if snapshot is not None:
+                        device.handover(snapshot)
+
+        else:
+            _log_payload_error(device, "empty", msg, logging.WARNING, "Received JSON MQTT message was empty and therefore it was ignored")
+
+    except PayloadError as e:
+        _log_payload_error(device, "payload", msg, logging.ERROR, "%s", e)
+
+    except TypeError as e:
+        _log_payload_error(device, "type", msg, logging.ERROR, "Received message is not valid. Check the README and sample payload. %s", e)
+
+    except ValueError as e:
+        _log_payload_error(device, "json", msg, logging.ERROR, "Received message is not a valid JSON. Check the README and sample payload. %s", e)
+
+    except Exception:
+        exception_type, exception_object, exception_traceback = sys.exc_info()
+        file = exception_traceback.tb_frame.f_code.co_filename
+        line = exception_traceback.tb_lineno
+        _log_payload_error(device, "exception", msg, logging.ERROR, "Exception occurred: %r of type %s in %s line #%i", exception_object, exception_type, file, line)
+
+
+# errors of the same type and device are logged 5 times at once and then once every 10 seconds
+error_limiter = RateLimiter(burst=5, rate=0.1)
+# log level of every error type, for the summary of the suppressed errors
+_error_levels = {}
+
+
+def _log_payload_error(device, error, msg, level, message, *args):
+    device.errors[error] += 1
+    _error_levels[error] = level
+    suppressed = error_limiter.acquire((device.topic, error))
+    if suppressed is None:
+        return
+    if suppressed:
+        message += " (%i similar errors suppressed)"
+        args += (suppressed,)
+    logging.log(level, message, *args)
+    if logging.root.isEnabledFor(logging.DEBUG):
+        logging.debug("MQTT payload: %s", str(msg.payload)[1:])
+
+
+def log_suppressed_errors():
+    """Log the number of suppressed errors, which were not followed by another error of the same type.
+    Called every 10 seconds by a GLib timer."""
+    for (topic, error), suppressed in error_limiter.flush():
+        logging.log(_error_levels.get(error, logging.ERROR), 'MQTT payload: %i similar errors of type "%s" suppressed for topic "%s"', suppressed, error, topic)
+    return True
+
+
+# formatting
+def _kwh(p, v):
+    return str("%.2f" % v) + "kWh"
+
+
+def _a(p, v):
+    return str("%.1f" % v) + "A"
+
+
+def _w(p, v):
+    return str("%i" % v) + "W"
+
+
+def _v(p, v):
+    return str("%.2f" % v) + "V"
+
+
+def _hz(p, v):
+    return str("%.4f" % v) + "Hz"
+
+
+def _n(p, v):
+    return str("%i" % v)
+
+
+def _ms(p, v):
+    return str("%.1f" % v) + "ms"
+
+
+# channels of the statistics, the total and every phase
+STATS_CHANNELS = ("/Ac",) + tuple("/Ac/" + phase for phase in PHASES)
+
+# percentiles of the latency
+LATENCY_PERCENTILES = (50, 95, 99)
+
+
+def get_paths(device, stats_windows=()):
+    """Return the D-Bus paths of a device as dict ``{path: {"initial": value, "textformat": function, "type": type}}``.
+
+    :param stats_windows: windows in seconds, for which the power statistics paths are added
+    """
+    paths_dbus = {
+        "/Ac/Power": {"initial": None, "textformat": _w, "type": float},
+        "/Ac/Current": {"initial": None, "textformat": _a, "type": float},
+        "/Ac/Voltage": {"initial": None, "textformat": _v, "type": float},
+        "/Ac/Energy/Forward": {"initial": None, "textformat": _kwh, "type": float},
+        "/Ac/MaxPower": {"initial": device.max_power, "textformat": _w, "type": int},
+        "/Ac/Position": {"initial": device.position, "textformat": _n, "type": int},
+        "/Ac/StatusCode": {"initial": 0, "textformat": _n, "type": int},
+        "/UpdateIndex": {"initial": 0, "textformat": _n, "type": int},
+    }
+
+    for phase in PHASES:
+        paths_dbus.update(
+            {
+                "/Ac/" + phase + "/Power": {"initial": None, "textformat": _w, "type": float},
+                "/Ac/" + phase + "/Current": {"initial": None, "textformat": _a, "type": float},
+                "/Ac/" + phase + "/Voltage": {"initial": None, "textformat": _v, "type": float},
+                "/Ac/" + phase + "/Frequency": {"initial": None, "textformat": _hz, "type": float},
+                "/Ac/" + phase + "/PowerFactor": {"initial": None, "textformat": _n, "type": float},
+                "/Ac/" + phase + "/Energy/Forward": {"initial": None, "textformat": _kwh, "type": float},
+            }
+        )
+
+    # latency from the MQTT receive and from the timestamp in the payload (if sent by the device) to the D-Bus
+    for source in ("Receive", "Device"):
+        for percentile in LATENCY_PERCENTILES:
+            paths_dbus["/Stats/Latency/" + source + "/P" + str(percentile)] = {"initial": None, "textformat": _ms, "type": float}
+    paths_dbus["/Stats/Latency/Device/Last"] = {"initial": None, "textformat": _ms, "type": float}
+
+    for window in stats_windows:
+        for channel in STATS_CHANNELS:
+            for name in ("Min", "Max", "Avg", "StdDev"):
+                paths_dbus["/Stats" + channel + "/Power/" + get_window_name(window) + "/" + name] = {"initial": None, "textformat": _w, "type": float}
+
+    return paths_dbus
+
+
+class DbusMqttPvService:
+    def __init__(
+        self,
+        dbusservice,
+        device,
+        paths,
+        scheduler,
+        reconnector=None,
+        productname="MQTT PV",
+        connection="MQTT PV service",
+        publish_mode="timer",
+        publish_interval_min=100,
+        publish_interval_max=1000,
+        timeout=60,
+        deadband=None,
+        on_timeout=sys.exit,
+        stats_windows=(),
+    ):
+        """
+        :param dbusservice: not yet registered VeDbusService
+        :param device: PvDevice, which is published
+        :param paths: D-Bus paths, see ``get_paths()``
+        :param scheduler: provides ``timeout_add(milliseconds, callback)`` and ``idle_add(callback)``, like the GLib module
+        :param reconnector: Reconnector, which provides the state of the MQTT connection for ``/Mgmt/Connection``
+        :param publish_mode: ``timer`` publishes every ``publish_interval_max`` milliseconds, ``event`` as soon as
+            new values are received, but not more often than every ``publish_interval_min`` milliseconds
+        :param timeout: seconds without a new MQTT message, after which the device is disconnected. ``0`` disables the timeout
+        :param deadband: Deadband, which drops insignificant changes, or ``None``
+        :param on_timeout: called, when the timeout is exceeded. If ``None``, ``/Connected`` is set to 0 and the values
+            are invalidated, until the next MQTT message of the device is received
+        :param stats_windows: windows in seconds of the power statistics, the paths have to be in ``paths``
+        """
+        self._dbusservice = dbusservice
+        self._device = device
+        self._paths = paths
+        self._scheduler = scheduler
+        self._reconnector = reconnector
+        self._publish_interval_min = publish_interval_min
+        self._timeout = timeout
+        self._on_timeout = on_timeout
+
+        # the samples of the power statistics are added by the device for every decoded message, so that
+        # the min and max also contain the values between two publish cycles
+        if stats_windows:
+            stats = {channel: [None, [RollingStats(window) for window in stats_windows]] for channel in STATS_CHANNELS}
+            with device.lock:
+                device.stats = stats
+            # [(path prefix, RollingStats), ...]
+            self._stats = [("/Stats" + channel + "/Power/" + get_window_name(window) + "/", channel_stats) for channel in STATS_CHANNELS for window, channel_stats in zip(stats_windows, stats[channel][1])]
+        else:
+            self._stats = None
+        self._latency = {"Receive": RollingPercentiles(), "Device": RollingPercentiles()}
+        self._latency_time = None
+        self._published = None
+        self._published_time = 0
+        self._deadband = deadband
+        self._wakeup_pending = False
+        self._timed_out = False
+
+        # counters and the duration of the last publish cycle in seconds, for the metrics
+        self.signals = 0
+        self.changes = 0
+        self.timeouts = 0
+        self.publish_time = 0.0
+        self.publish_time_total = 0.0
+
+        deviceinstance = device.instance
+
+        logging.debug("%s /DeviceInstance = %d" % (dbusservice.name, deviceinstance))
+
+        # Create the management objects, as specified in the ccgx dbus-api document
+        self._dbusservice.add_path("/Mgmt/ProcessName", sys.argv[0])
+        self._dbusservice.add_path(
+            "/Mgmt/ProcessVersion",
+            "Unkown version, and running on Python " + platform.python_version(),
+        )
+        self._dbusservice.add_path("/Mgmt/Connection", connection)
+
+        # Create the mandatory objects
+        self._dbusservice.add_path("/DeviceInstance", deviceinstance)
+        self._dbusservice.add_path("/ProductId", 0xFFFF)
+        self._dbusservice.add_path("/ProductName", productname)
+        self._dbusservice.add_path("/CustomName", device.name)
+        self._dbusservice.add_path("/FirmwareVersion", "0.1.10-dev (20250929)")
+        # self._dbusservice.add_path('/HardwareVersion', '')
+        self._dbusservice.add_path("/Connected", 1)
+
+        self._dbusservice.add_path("/Latency", None, valuetype=float)
+        self._dbusservice.add_path("/ErrorCode", 0)
+        self._dbusservice.add_path("/Position", device.position)  # only needed for pvinverter
+        self._dbusservice.add_path("/StatusCode", 0)  # Dummy path so VRM detects us as a PV-inverter
+
+        for path, settings in self._paths.items():
+            self._dbusservice.add_path(
+                path,
+                settings["initial"],
+                gettextcallback=settings["textformat"],
+                valuetype=settings["type"],
+                writeable=True,
+                onchangecallback=self._handlechangedvalue,
+            )
+
+        # set the values already received, so that the service starts with valid values
+        self._publish()
+
+        # register VeDbusService after all paths where added
+        self._dbusservice.register()
+
+        # publish new values as soon as they are received
+        if publish_mode == "event":
+            device.on_snapshot = self._wakeup
+
+        self._scheduler.timeout_add(publish_interval_max, self._update)  # pause before the next request
+
+    def _wakeup(self):
+        # called from the MQTT thread, wake up the GLib.MainLoop() only once for multiple new snapshots
+        if not self._wakeup_pending:
+            self._wakeup_pending = True
+            self._scheduler.idle_add(self._publish_event)
+
+    def _publish_event(self):
+        # coalesce bursts of messages by waiting until the minimum publish interval has passed
+        wait = self._publish_interval_min - (monotonic() - self._published_time) * 1000
+        if wait > 0:
+            self._scheduler.timeout_add(int(wait) + 1, self._publish_event)
+            return False
+
+        # reset before the snapshot is read, so that a snapshot handed over while publishing triggers a new wakeup
+        self._wakeup_pending = False
+        self._publish()
+        return False
+
+    def _update(self):
+
+        timed_out = self._timeout != 0 and (int(time()) - self._device.last_changed) > self._timeout
+
+        # publish the current values again, when the device sends again after a timeout
+        if self._timed_out and not timed_out:
+            logging.warning('Device "%s" is connected again, since a new MQTT message was received on "%s".' % (self._device.name, self._device.topic))
+            self._timed_out = False
+            self._published = None
+
+        self._publish()
+
+        # quit driver or disconnect the device if timeout is exceeded
+        if timed_out and not self._timed_out:
+            self.timeouts += 1
+            if self._on_timeout is not None:
+                logging.error('Driver stopped. Timeout of %i seconds exceeded, since no new MQTT message was received on "%s" in this time.' % (self._timeout, self._device.topic))
+                self._on_timeout()
+            else:
+                logging.error('Device "%s" disconnected. Timeout of %i seconds exceeded, since no new MQTT message was received on "%s" in this time.' % (self._device.name, self._timeout, self._device.topic))
+                self._timed_out = True
+                self._publish(invalidate=True)
+
+        return True
+
+    def _publish(self, invalidate=False):
+
+        start = perf_counter()
+        now = monotonic()
+        self._published_time = now
+
+        self._device.flush(now)
+
+        # collect all changes and emit them as one ItemsChanged signal
+        with self._dbusservice as dbusservice:
+            publish = self._invalidate_values if invalidate else self._publish_values
+            if self._deadband is not None:
+                publish(self._deadband.filter(dbusservice, now))
+            else:
+                publish(dbusservice)
+
+            # the changes are emitted as one ItemsChanged signal when the context exits
+            if dbusservice.changes:
+                self.signals += 1
+                self.changes += len(dbusservice.changes)
+
+        self.publish_time = perf_counter() - start
+        self.publish_time_total += self.publish_time
+
+    @property
+    def device(self):
+        return self._device
+
+    @property
+    def deadband(self):
+        return self._deadband
+
+    @property
+    def queue_depth(self):
+        """Messages and snapshots received, but not yet published."""
+        held = 1 if self._device.snapshot is not self._published and self._device.snapshot.power is not None else 0
+        if self._device.ingest is not None:
+            held += self._device.ingest.pending
+        return held
+
+    def _publish_values(self, dbusservice):
+
+        # read the snapshot only once, so that all published values are from the same message
+        snapshot = self._device.snapshot
+
+        # nothing is published before the first data was received
+        if snapshot is not self._published and snapshot.power is not None:
+
+            dbusservice["/Ac/Power"] = round(snapshot.power, 2) if snapshot.power is not None else None
+            dbusservice["/Ac/Current"] = round(snapshot.current, 2) if snapshot.current is not None else None
+            dbusservice["/Ac/Voltage"] = round(snapshot.voltage, 2) if snapshot.voltage is not None else None
+            dbusservice["/Ac/Energy/Forward"] = round(snapshot.forward, 2) if snapshot.forward is not None else None
+
+            for phase, phase_snapshot in zip(PHASES, (snapshot.L1, snapshot.L2, snapshot.L3)):
+                if phase_snapshot is not None:
+                    dbusservice["/Ac/" + phase + "/Power"] = round(phase_snapshot.power, 2)
+                    dbusservice["/Ac/" + phase + "/Current"] = round(phase_snapshot.current, 2) if phase_snapshot.current is not None else None
+                    dbusservice["/Ac/" + phase + "/Voltage"] = round(phase_snapshot.voltage, 2) if phase_snapshot.voltage is not None else None
+                    dbusservice["/Ac/" + phase + "/Frequency"] = round(phase_snapshot.frequency, 2) if phase_snapshot.frequency is not None else None
+                    dbusservice["/Ac/" + phase + "/PowerFactor"] = round(phase_snapshot.power_factor, 3) if phase_snapshot.power_factor is not None else None
+                    dbusservice["/Ac/" + phase + "/Energy/Forward"] = round(phase_snapshot.forward, 2) if phase_snapshot.forward is not None else None
+                # at least one phase is needed to work properly
+                elif phase == "L1" and snapshot.L2 is None and snapshot.L3 is None:
+                    dbusservice["/Ac/L1/Power"] = round(snapshot.power, 2) if snapshot.power is not None else None
+                    dbusservice["/Ac/L1/Current"] = round(snapshot.current, 2) if snapshot.current is not None else None
+                    dbusservice["/Ac/L1/Voltage"] = round(snapshot.voltage, 2) if snapshot.voltage is not None else None
+                    dbusservice["/Ac/L1/Frequency"] = None
+                    dbusservice["/Ac/L1/Energy/Forward"] = round(snapshot.forward, 2) if snapshot.forward is not None else None
+
+            if self._stats is not None:
+                self._publish_stats(dbusservice)
+
+            self._publish_latency(dbusservice, snapshot)
+
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug("PV: %.1f W - %.1f V - %.1f A", snapshot.power, snapshot.voltage, snapshot.current)
+                for phase, phase_snapshot in zip(PHASES, (snapshot.L1, snapshot.L2, snapshot.L3)):
+                    if phase_snapshot is not None and phase_snapshot.power:
+                        logging.debug("|- %s: %.1f W - %.1f V - %.1f A", phase, phase_snapshot.power, phase_snapshot.voltage, phase_snapshot.current)
+
+            # the device was disconnected by the timeout
+            if dbusservice["/Connected"] != 1:
+                dbusservice["/Connected"] = 1
+
+            # is only displayed for Fronius inverters (product ID 0xA142) in GUI but displayed in VRM portal
+            # if power above 10 W, set status code to 7 (running)
+            if dbusservice["/Ac/Power"] >= 10:
+                if dbusservice["/StatusCode"] != 7:
+                    dbusservice["/StatusCode"] = 7
+            # else set status code to 8 (standby)
+            else:
+                if dbusservice["/StatusCode"] != 8:
+                    dbusservice["/StatusCode"] = 8
+
+            self._published = snapshot
+
+        # show the state of the MQTT connection
+        if self._reconnector is not None:
+            dbusservice["/Mgmt/Connection"] = self._reconnector.status
+
+        # increment UpdateIndex - to show that new data is available
+        index = dbusservice["/UpdateIndex"] + 1  # increment index
+        if index > 255:  # maximum value of the index
+            index = 0  # overflow from 255 to 0
+        dbusservice["/UpdateIndex"] = index
+
+    def _invalidate_values(self, dbusservice):
+        # the values of the device are unknown, until it sends again
+        dbusservice["/Connected"] = 0
+        for path, settings in self._paths.items():
+            if settings["initial"] is None:
+                dbusservice[path] = None
+
+    def _publish_stats(self, dbusservice):
+        # the MQTT thread adds the samples
+        with self._device.lock:
+            values = [(prefix, stats.min, stats.max, stats.avg, stats.stddev) for prefix, stats in self._stats if len(stats)]
+
+        for prefix, minimum, maximum, avg, stddev in values:
+            dbusservice[prefix + "Min"] = round(minimum, 2)
+            dbusservice[prefix + "Max"] = round(maximum, 2)
+            dbusservice[prefix + "Avg"] = round(avg, 2)
+            dbusservice[prefix + "StdDev"] = round(stddev, 2)
+
+    def _publish_latency(self, dbusservice, snapshot):
+        # receive time of the newest values, the phases of Tasmota are received in separate messages
+        received = max((value.time for value in (snapshot, snapshot.L1, snapshot.L2, snapshot.L3) if value is not None and value.time is not None), default=None)
+        if received is None or received == self._latency_time:
+            return
+        self._latency_time = received
+
+        # the ItemsChanged signal is emitted right after this publish cycle
+        latency = (monotonic() - received) * 1000
+        dbusservice["/Latency"] = round(latency, 1)
+        self._publish_percentiles(dbusservice, "Receive", latency)
+
+        if snapshot.device_time is not None:
+            # includes the clock difference between the device and the GX device
+            latency = (time() - snapshot.device_time) * 1000
+            dbusservice["/Stats/Latency/Device/Last"] = round(latency, 1)
+            self._publish_percentiles(dbusservice, "Device", latency)
+
+    def _publish_percentiles(self, dbusservice, source, latency):
+        percentiles = self._latency[source]
+        percentiles.add(latency)
+        for percentile, value in zip(LATENCY_PERCENTILES, percentiles.percentiles(*LATENCY_PERCENTILES)):
+            dbusservice["/Stats/Latency/" + source + "/P" + str(percentile)] = round(value, 1)
+
+    def _handlechangedvalue(self, path, value):
+        logging.debug("someone else updated %s to %s", path, value)
+        return True  # accept the change
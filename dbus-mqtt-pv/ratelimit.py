@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+# Rate limit of repeated log messages, so that a device sending invalid payloads several times per
+# second does not flood the log.
+#
+# Every key (like the topic and the error type) has its own token bucket: up to "burst" messages are
+# logged at once, then one message every 1 / "rate" seconds. The messages in between are only counted
+# and the next logged message tells how many were suppressed. If no further message comes, flush()
+# returns the suppressed counts as soon as they can be logged, so that they are not lost.
+
+import threading
+from time import monotonic
+
+
+class RateLimiter:
+    def __init__(self, burst=5, rate=0.1):
+        """
+        :param burst: messages, which are logged at once
+        :param rate: messages per second, which are logged after the burst
+        """
+        self.burst = burst
+        self.rate = rate
+        # {key: [tokens, time of the last refill, suppressed messages]}
+        self._buckets = {}
+        # acquire() is called in paho's thread and flush() in the GLib.MainLoop()
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """Return ``None`` if the message has to be suppressed, else the number of messages suppressed before."""
+        now = monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            else:
+                self._refill(bucket, now)
+
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                return None
+
+            bucket[0] -= 1.0
+            suppressed = bucket[2]
+            bucket[2] = 0
+            return suppressed
+
+    def flush(self):
+        """Return ``[(key, suppressed)]`` of the keys with suppressed messages, which can be logged again.
+
+        The summary of the suppressed messages counts as logged message, like in ``acquire()``.
+        """
+        now = monotonic()
+        flushed = []
+        with self._lock:
+            for key, bucket in self._buckets.items():
+                if bucket[2] == 0:
+                    continue
+                self._refill(bucket, now)
+                if bucket[0] >= 1.0:
+                    bucket[0] -= 1.0
+                    flushed.append((key, bucket[2]))
+                    bucket[2] = 0
+        return flushed
+
+    def _refill(self, bucket, now):
+        bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
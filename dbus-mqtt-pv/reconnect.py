@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+# Reconnect state machine for the MQTT client with jittered exponential backoff.
+#
+# The reconnect attempts are never made from the MQTT callbacks. Either paho's network thread makes
+# them (loop_start()), using the delay set with reconnect_delay_set() for every attempt, or they are
+# scheduled with the given "schedule" function, e.g. in the GLib.MainLoop(). The DNS lookup, the TCP
+# connect and the TLS or websocket handshake block for up to the connect timeout, which would stop the
+# D-Bus service meanwhile. So only the socket is created in a short-lived thread, which does not touch
+# the state of the client. The connected socket is handed back with the schedule function and the
+# client is reconnected with it in the thread of the main loop, where all socket callbacks run.
+
+import logging
+import random
+import threading
+
+STATE_CONNECTING = "connecting"
+STATE_CONNECTED = "connected"
+STATE_RECONNECTING = "reconnecting"
+
+
+class Reconnector:
+    def __init__(self, client, min_delay=1, max_delay=60, schedule=None):
+        """
+        :param client: paho MQTT client
+        :param min_delay: delay in seconds before the first reconnect attempt
+        :param max_delay: maximum delay in seconds between two reconnect attempts
+        :param schedule: function ``schedule(delay, callback)`` which calls ``callback`` after ``delay`` seconds. It
+            has to be callable from any thread. If ``None``, paho's network thread reconnects.
+        """
+        self._client = client
+        self._min_delay = min_delay
+        self._max_delay = max_delay
+        self._schedule = schedule
+
+        self.state = STATE_CONNECTING
+        # failed attempts since the connection was lost
+        self.attempts = 0
+        # successful reconnects since the start
+        self.reconnects = 0
+
+    @property
+    def status(self):
+        if self.state == STATE_RECONNECTING and self.attempts > 0:
+            return "MQTT %s (attempt %i)" % (self.state, self.attempts + 1)
+        return "MQTT " + self.state
+
+    def get_delay(self):
+        # exponential backoff with equal jitter, so that many clients do not reconnect at the same time
+        delay = min(self._max_delay, self._min_delay * 2**self.attempts)
+        return random.uniform(delay / 2, delay)
+
+    def connected(self):
+        if self.state == STATE_RECONNECTING:
+            self.reconnects += 1
+        self.state = STATE_CONNECTED
+        self.attempts = 0
+
+    def disconnected(self):
+        # the connection was lost or the broker refused a reconnect attempt
+        if self.state != STATE_CONNECTED:
+            self.attempts += 1
+        self.state = STATE_RECONNECTING
+        self._schedule_reconnect()
+
+    def connect_failed(self):
+        # the broker was not reachable
+        self.attempts += 1
+        self.state = STATE_RECONNECTING
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self):
+        delay = self.get_delay()
+        logging.info("MQTT client: Reconnecting in %.1f seconds" % delay)
+        if self._schedule is None:
+            # paho's network thread waits for this delay before the next attempt
+            self._client.reconnect_delay_set(min_delay=delay, max_delay=delay)
+        else:
+            self._schedule(delay, self._reconnect)
+
+    def _reconnect(self):
+        threading.Thread(target=self._create_socket, name="mqtt-reconnect", daemon=True).start()
+        return False
+
+    def _create_socket(self):
+        # paho's own socket setup, which only reads the settings of the client
+        try:
+            sock = self._client._create_socket()
+        except Exception as e:
+            logging.error("MQTT client: Reconnect failed: %s" % e)
+            self._schedule(0, self._reconnect_failed)
+            return
+        self._schedule(0, lambda: self._reconnect_socket(sock))
+
+    def _reconnect_socket(self, sock):
+        # reconnect() uses the already connected socket instead of creating a new one
+        self._client._create_socket = lambda: sock
+        try:
+            self._client.reconnect()
+        except Exception as e:
+            logging.error("MQTT client: Reconnect failed: %s" % e)
+            sock.close()
+            self.connect_failed()
+        finally:
+            del self._client._create_socket
+        return False
+
+    def _reconnect_failed(self):
+        self.connect_failed()
+        return False
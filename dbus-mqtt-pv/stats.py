@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+# Rolling window statistics (min, max, average, standard deviation) of the power values.
+#
+# The samples are combined into time buckets (one per second) with their min, max, sum and count, so
+# the memory only depends on the window length and the window keeps its full length at any message
+# rate. Every sample is added in constant time (amortized), independent of the window length: min and
+# max of the closed buckets are kept in monotonic deques, the average and standard deviation are
+# calculated from running sums, which are updated when a bucket enters or leaves the window.
+#
+# The percentiles of the latency are taken from a histogram with logarithmic buckets, so adding a
+# sample is constant time and a percentile is off by at most the bucket width.
+
+from collections import deque
+from math import ceil, log, sqrt
+
+
+def get_window_name(seconds):
+    # used in the D-Bus path, like "/Stats/Ac/Power/15min/Avg"
+    return "%imin" % (seconds // 60) if seconds % 60 == 0 else "%is" % seconds
+
+
+def get_windows(value):
+    """Return the windows in seconds of a comma separated list of minutes, like ``1, 15``."""
+    return [int(float(minutes) * 60) for minutes in value.split(",") if minutes.strip() != ""]
+
+
+class RollingStats:
+    def __init__(self, window, resolution=1.0):
+        """
+        :param window: length of the window in seconds
+        :param resolution: length of a time bucket in seconds, the window moves in these steps
+        """
+        self.window = window
+        self._resolution = resolution
+        # closed buckets [start, min, max, sum, sum of squares, count], the current bucket is not yet included
+        self._buckets = deque()
+        self._current = None
+        # buckets which can still have the min or max, in increasing (min) or decreasing (max) order
+        self._min = deque()
+        self._max = deque()
+        self._sum = 0.0
+        self._sum_squares = 0.0
+        self._count = 0
+
+    def __len__(self):
+        # samples in the window
+        return self._count + (self._current[5] if self._current is not None else 0)
+
+    def add(self, time, value):
+        start = time // self._resolution * self._resolution
+        current = self._current
+        if current is None or start > current[0]:
+            if current is not None:
+                self._close(current)
+            current = self._current = [start, value, value, 0.0, 0.0, 0]
+        elif value < current[1]:
+            current[1] = value
+        elif value > current[2]:
+            current[2] = value
+        current[3] += value
+        current[4] += value * value
+        current[5] += 1
+
+        # drop the buckets, which ended before the window
+        limit = time - self.window
+        while self._buckets and self._buckets[0][0] + self._resolution <= limit:
+            self._remove()
+
+    def _close(self, bucket):
+        self._buckets.append(bucket)
+        self._sum += bucket[3]
+        self._sum_squares += bucket[4]
+        self._count += bucket[5]
+
+        while self._min and self._min[-1][1] >= bucket[1]:
+            self._min.pop()
+        self._min.append(bucket)
+        while self._max and self._max[-1][2] <= bucket[2]:
+            self._max.pop()
+        self._max.append(bucket)
+
+    def _remove(self):
+        bucket = self._buckets.popleft()
+        if self._min[0] is bucket:
+            self._min.popleft()
+        if self._max[0] is bucket:
+            self._max.popleft()
+
+        if not self._buckets:
+            # start again from zero, so that rounding errors do not accumulate
+            self._sum = 0.0
+            self._sum_squares = 0.0
+            self._count = 0
+        else:
+            self._sum -= bucket[3]
+            self._sum_squares -= bucket[4]
+            self._count -= bucket[5]
+
+    @property
+    def min(self):
+        if self._current is None:
+            return None
+        return min(self._min[0][1], self._current[1]) if self._min else self._current[1]
+
+    @property
+    def max(self):
+        if self._current is None:
+            return None
+        return max(self._max[0][2], self._current[2]) if self._max else self._current[2]
+
+    @property
+    def avg(self):
+        if self._current is None:
+            return None
+        return (self._sum + self._current[3]) / (self._count + self._current[5])
+
+    @property
+    def stddev(self):
+        # population standard deviation of the samples in the window
+        if self._current is None:
+            return None
+        count = self._count + self._current[5]
+        avg = (self._sum + self._current[3]) / count
+        return sqrt(max(0.0, (self._sum_squares + self._current[4]) / count - avg * avg))
+
+
+class RollingPercentiles:
+    def __init__(self, size=1000, minimum=0.1, maximum=100000.0, factor=1.1):
+        """
+        :param size: number of the last samples, over which the percentiles are calculated
+        :param minimum: upper bound of the first bucket, smaller samples are counted in it
+        :param maximum: larger samples are counted in the last bucket
+        :param factor: ratio of the upper to the lower bound of a bucket
+        """
+        self.size = size
+        self._minimum = minimum
+        self._factor = factor
+        self._log_factor = log(factor)
+        self._last_bucket = ceil(log(maximum / minimum) / self._log_factor) + 1
+        self._counts = [0] * (self._last_bucket + 1)
+        self._samples = deque()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, value):
+        bucket = 0 if value < self._minimum else min(self._last_bucket, int(log(value / self._minimum) / self._log_factor) + 1)
+        self._counts[bucket] += 1
+        self._samples.append(bucket)
+        if len(self._samples) > self.size:
+            self._counts[self._samples.popleft()] -= 1
+
+    def percentiles(self, *percents):
+        """Return the upper bound of the bucket of every percentile (0 - 100, ascending), ``None`` without samples."""
+        if not self._samples:
+            return [None] * len(percents)
+
+        results = []
+        count = 0
+        bucket = -1
+        for percent in percents:
+            # rank of the sample, which is the percentile
+            rank = max(1, ceil(len(self._samples) * percent / 100))
+            while count < rank:
+                bucket += 1
+                count += self._counts[bucket]
+            results.append(self._minimum * self._factor**bucket)
+        return results
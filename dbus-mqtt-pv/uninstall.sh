@@ -40,6 +40,8 @@ read -r DELETE_FILES
 if [[ "$DELETE_FILES" == "y" || "$DELETE_FILES" == "Y" ]]; then
     echo "Deleting all driver files..."
     rm -rf "$SCRIPT_DIR"
+    # default checkpoint file, which is kept next to the driver folder
+    rm -f "${SCRIPT_DIR}_checkpoint.json"
     echo "done."
 else
     echo "Driver files not deleted."
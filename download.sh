@@ -143,6 +143,14 @@ if [ -f ${driver_path}/${driver_name_instance}/config.ini ]; then
 fi
 
 
+# If updating: move the checkpoint of older versions out of the driver folder, where the driver looks for it now
+if [ -f ${driver_path}/${driver_name_instance}/checkpoint.json ] && [ ! -f ${driver_path}/${driver_name_instance}_checkpoint.json ]; then
+    echo ""
+    echo "Moving existing checkpoint file..."
+    mv ${driver_path}/${driver_name_instance}/checkpoint.json ${driver_path}/${driver_name_instance}_checkpoint.json
+fi
+
+
 # If updating: cleanup existing driver
 if [ -d ${driver_path}/${driver_name_instance} ]; then
     echo ""
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+# Usage: python -m pytest tests  or  python -m unittest discover tests
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+
+from checkpoint import Checkpoint, get_state, restore_snapshot  # noqa: E402
+from decoder import EMPTY_SNAPSHOT, PhaseSnapshot, PvSnapshot  # noqa: E402
+
+TOPIC = "N/pv"
+SAVED = {TOPIC: {"total": 12.5, "L1": 4.0, "L2": 4.25, "L3": 4.25}}
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, "checkpoint.json")
+        Checkpoint(self.filename).save(SAVED, force=True)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_exit_before_first_data(self):
+        checkpoint = Checkpoint(self.filename)
+        restored = checkpoint.load()[TOPIC]
+
+        # the save on exit, before any message was received
+        checkpoint.save({TOPIC: get_state(EMPTY_SNAPSHOT, restored)}, force=True)
+
+        self.assertEqual(Checkpoint(self.filename).load(), SAVED)
+
+    def test_save_without_state(self):
+        checkpoint = Checkpoint(self.filename)
+        checkpoint.load()
+        checkpoint.save({TOPIC: {}}, force=True)
+
+        self.assertEqual(Checkpoint(self.filename).load(), SAVED)
+
+    def test_phase_not_received_yet(self):
+        checkpoint = Checkpoint(self.filename)
+        restored = checkpoint.load()[TOPIC]
+
+        # like Tasmota, which sends one phase per message
+        phase = PhaseSnapshot(100.0, 0.43, 230.0, 50.0, None, 0.0, 1.0)
+        snapshot = restore_snapshot(PvSnapshot(100.0, 0.43, 230.0, 0.0, phase, None, None, 1.0), restored, TOPIC)
+        self.assertEqual(snapshot.L1.forward, 4.0)
+        self.assertEqual(restored, {"L2": 4.25, "L3": 4.25})
+
+        checkpoint.save({TOPIC: get_state(snapshot, restored)}, force=True)
+
+        self.assertEqual(Checkpoint(self.filename).load(), SAVED)
+
+    def test_newer_values_are_saved(self):
+        checkpoint = Checkpoint(self.filename)
+        checkpoint.load()
+        checkpoint.save({TOPIC: {"total": 13.0}, "N/pv2": {"total": 1.0}}, force=True)
+
+        self.assertEqual(Checkpoint(self.filename).load(), {TOPIC: dict(SAVED[TOPIC], total=13.0), "N/pv2": {"total": 1.0}})
+
+
+if __name__ == "__main__":
+    unittest.main()
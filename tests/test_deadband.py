@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+# Usage: python -m pytest tests  or  python -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+
+from deadband import Deadband, get_path_class, get_thresholds  # noqa: E402
+
+
+class DeadbandTest(unittest.TestCase):
+    def test_thresholds_of_config(self):
+        thresholds = get_thresholds({"power_absolute": "2", "power_relative": "1", "/Ac/L1/Power_relative": "0.5", "refresh": "60"})
+
+        self.assertEqual(thresholds, {"power": (2.0, 0.01), "/ac/l1/power": (0.0, 0.005)})
+
+    def test_path_class(self):
+        self.assertEqual(get_path_class("/Ac/L2/Power"), "power")
+        self.assertEqual(get_path_class("/Ac/Energy/Forward"), "energy")
+        self.assertIsNone(get_path_class("/StatusCode"))
+
+    def test_absolute_and_relative(self):
+        deadband = Deadband({"power": (2.0, 0.01)})
+
+        self.assertTrue(deadband.accept("/Ac/Power", 1000.0, 0))
+        # the relative deadband (10 W) is larger than the absolute one
+        self.assertFalse(deadband.accept("/Ac/Power", 1009.0, 1))
+        self.assertTrue(deadband.accept("/Ac/Power", 1011.0, 2))
+        # compared with the last published value, not with the last suppressed one
+        self.assertFalse(deadband.accept("/Ac/Power", 1020.0, 3))
+        self.assertEqual((deadband.passed, deadband.suppressed), (2, 2))
+        self.assertEqual(deadband.suppression_ratio, 0.5)
+
+    def test_path_overrides_class(self):
+        deadband = Deadband({"power": (100.0, 0.0), "/ac/l1/power": (0.0, 0.0)})
+
+        deadband.accept("/Ac/L1/Power", 500.0, 0)
+        deadband.accept("/Ac/L2/Power", 500.0, 0)
+
+        self.assertTrue(deadband.accept("/Ac/L1/Power", 501.0, 1))
+        self.assertFalse(deadband.accept("/Ac/L2/Power", 501.0, 1))
+
+    def test_refresh_and_invalid(self):
+        deadband = Deadband({"voltage": (5.0, 0.0)}, refresh=60)
+
+        deadband.accept("/Ac/Voltage", 230.0, 0)
+        self.assertFalse(deadband.accept("/Ac/Voltage", 231.0, 59))
+        self.assertTrue(deadband.accept("/Ac/Voltage", 231.0, 60))
+        # invalidating and the first valid value afterwards are always published
+        self.assertTrue(deadband.accept("/Ac/Voltage", None, 61))
+        self.assertTrue(deadband.accept("/Ac/Voltage", 231.0, 62))
+
+    def test_paths_without_deadband(self):
+        deadband = Deadband({"power": (2.0, 0.0)})
+
+        self.assertTrue(deadband.accept("/StatusCode", 7, 0))
+        self.assertTrue(deadband.accept("/StatusCode", 8, 1))
+        self.assertEqual(deadband.passed, 0)
+
+    def test_filter(self):
+        deadband = Deadband({"power": (2.0, 0.0)})
+        dbusservice = {"/Ac/Power": None}
+
+        deadband.filter(dbusservice, 0)["/Ac/Power"] = 100.0
+        deadband.filter(dbusservice, 1)["/Ac/Power"] = 101.0
+
+        self.assertEqual(dbusservice["/Ac/Power"], 100.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
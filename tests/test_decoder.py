@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+# Usage: python -m pytest tests  or  python -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+
+from decoder import EMPTY_SNAPSHOT, PayloadError, build_decoder, get_device_time, json_loads  # noqa: E402
+
+
+class DecoderTest(unittest.TestCase):
+    def setUp(self):
+        self.decode = build_decoder(voltage=230, frequency=50, standby_power=0)
+
+    def test_generic(self):
+        snapshot = self.decode(json_loads(b'{"pv": {"power": 460, "L1": {"power": 460, "voltage": 231}}}'), EMPTY_SNAPSHOT, 1.0)
+        self.assertEqual(snapshot.power, 460.0)
+        self.assertEqual(snapshot.current, 2.0)
+        self.assertEqual(snapshot.forward, 0.0)
+        self.assertEqual(snapshot.L1.voltage, 231.0)
+        self.assertIsNone(snapshot.L2)
+        self.assertIsNone(snapshot.device_time)
+
+    def test_timestamp_in_seconds(self):
+        snapshot = self.decode(json_loads(b'{"pv": {"power": 100}, "timestamp": 1700000000.5}'), EMPTY_SNAPSHOT)
+        self.assertEqual(snapshot.device_time, 1700000000.5)
+
+    def test_timestamp_in_milliseconds(self):
+        snapshot = self.decode(json_loads(b'{"pv": {"power": 100}, "timestamp": 1700000000500}'), EMPTY_SNAPSHOT)
+        self.assertEqual(snapshot.device_time, 1700000000.5)
+
+    def test_invalid_timestamp_keeps_the_values(self):
+        for timestamp in (b'"2024-01-01T00:00:00Z"', b"null", b"true", b"{}", b'"nan"', b'"inf"'):
+            snapshot = self.decode(json_loads(b'{"pv": {"power": 100}, "timestamp": ' + timestamp + b"}"), EMPTY_SNAPSHOT)
+            self.assertEqual(snapshot.power, 100.0)
+            self.assertIsNone(snapshot.device_time, timestamp)
+
+    def test_get_device_time(self):
+        self.assertEqual(get_device_time("1700000000"), 1700000000.0)
+        self.assertEqual(get_device_time(1700000000123), 1700000000.123)
+        self.assertIsNone(get_device_time(float("nan")))
+        self.assertIsNone(get_device_time([1]))
+
+    def test_standby_power(self):
+        decode = build_decoder(voltage=230, frequency=50, standby_power=5)
+        snapshot = decode(json_loads(b'{"pv": {"power": 4, "current": 0.1}}'), EMPTY_SNAPSHOT)
+        self.assertEqual(snapshot.power, 0.0)
+        self.assertEqual(snapshot.current, 0.0)
+
+    def test_energy_integration(self):
+        first = self.decode(json_loads(b'{"pv": {"power": 1000}}'), EMPTY_SNAPSHOT, 0.0)
+        second = self.decode(json_loads(b'{"pv": {"power": 3000}}'), first, 36.0)
+        # average of 2000 W for 36 seconds
+        self.assertAlmostEqual(second.forward, 0.02)
+
+        # gaps above the maximum gap are not integrated
+        third = self.decode(json_loads(b'{"pv": {"power": 3000}}'), second, 136.0)
+        self.assertEqual(third.forward, second.forward)
+
+    def test_energy_forward_of_the_payload(self):
+        first = self.decode(json_loads(b'{"pv": {"power": 1000, "energy_forward": 12.5}}'), EMPTY_SNAPSHOT, 0.0)
+        self.assertEqual(first.forward, 12.5)
+
+    def test_tasmota_phases(self):
+        total = self.decode(json_loads(b'{"pv": {"power": 413}, "timestamp": 1700000000}'), EMPTY_SNAPSHOT, 1.0)
+        snapshot = self.decode(json_loads(b'{"pv": {"power_L2": 160}}'), total, 1.1)
+        self.assertEqual(snapshot.power, 413.0)
+        self.assertEqual(snapshot.L2.power, 160.0)
+        self.assertEqual(snapshot.L2.time, 1.1)
+        self.assertEqual(snapshot.time, 1.0)
+        self.assertEqual(snapshot.device_time, 1700000000.0)
+        self.assertIsNone(snapshot.L1)
+        self.assertIsNone(self.decode(json_loads(b'{"pv": {"power_L4": 1}}'), total, 1.2))
+
+    def test_shelly(self):
+        snapshot = self.decode(json_loads(b'{"apower": 612.3, "voltage": 231.4, "current": 2.712, "pf": 0.97, "aenergy": {"total": 153283.172}}'), EMPTY_SNAPSHOT, 1.0)
+        self.assertEqual(snapshot.power, 612.3)
+        self.assertAlmostEqual(snapshot.forward, 153.283172)
+        self.assertEqual(snapshot.L1.power_factor, 0.97)
+
+    def test_unknown_format(self):
+        with self.assertRaises(PayloadError):
+            self.decode(json_loads(b'{"power": 1}'), EMPTY_SNAPSHOT)
+        with self.assertRaises(PayloadError):
+            self.decode(json_loads(b'{"pv": 1}'), EMPTY_SNAPSHOT)
+
+
+if __name__ == "__main__":
+    unittest.main()
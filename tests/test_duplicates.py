@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+# Usage: python -m pytest tests  or  python -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+
+from pvservice import PvDevice, handle_message  # noqa: E402
+
+TOPIC = "N/pv"
+
+
+class Message:
+    def __init__(self, payload, timestamp):
+        self.topic = TOPIC
+        self.payload = payload
+        self.timestamp = timestamp
+
+
+def get_energy(skip_duplicates):
+    device = PvDevice("PV", 100, TOPIC, 1000, 0, "230", "50", "0", skip_duplicates=skip_duplicates)
+    # 1000 W for 25 seconds, then 0 W
+    for second in range(26):
+        handle_message(device, Message(b'{"pv": {"power": 1000, "L1": {"power": 1000}}}', float(second)))
+    handle_message(device, Message(b'{"pv": {"power": 0, "L1": {"power": 0}}}', 26.0))
+    return device
+
+
+class DuplicatesTest(unittest.TestCase):
+    def test_skipped_duplicates_are_integrated(self):
+        decoded = get_energy(skip_duplicates=False)
+        skipped = get_energy(skip_duplicates=True)
+
+        self.assertEqual(decoded.duplicates, 0)
+        self.assertEqual(skipped.duplicates, 25)
+        # 1000 W * 25.5 s
+        self.assertAlmostEqual(decoded.decoded.forward, 25500 / 3600000)
+        self.assertAlmostEqual(skipped.decoded.forward, decoded.decoded.forward)
+        self.assertAlmostEqual(skipped.decoded.L1.forward, decoded.decoded.L1.forward)
+
+
+if __name__ == "__main__":
+    unittest.main()
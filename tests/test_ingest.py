@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+# Usage: python -m pytest tests  or  python -m unittest discover tests
+
+import os
+import sys
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+
+from decoder import PhaseSnapshot, PvSnapshot  # noqa: E402
+from ingest import AveragePolicy, EveryNthPolicy, LatestPolicy, get_policy  # noqa: E402
+
+
+class Message:
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+
+
+def get_snapshot(power, timestamp):
+    L1 = PhaseSnapshot(power, power / 230, 230.0, 50.0, None, 1.0, timestamp)
+    return PvSnapshot(power, power / 230, 230.0, 1.0, L1, None, None, timestamp)
+
+
+class IngestTest(unittest.TestCase):
+    def test_get_policy(self):
+        self.assertIsNone(get_policy({}))
+        self.assertIsInstance(get_policy({"ingest": "latest"}), LatestPolicy)
+        self.assertEqual(get_policy({"ingest": "average", "ingest_interval": "500"}).interval, 0.5)
+        self.assertEqual(get_policy({"ingest": "every_nth", "ingest_nth": "3"}).n, 3)
+        with self.assertRaises(ValueError):
+            get_policy({"ingest": "newest"})
+
+    def test_latest(self):
+        policy = LatestPolicy(1.0)
+
+        accepted = [policy.accept(Message(t / 10)) for t in range(10)]
+
+        self.assertEqual(accepted, [True] + [False] * 9)
+        self.assertEqual((policy.received, policy.decoded, policy.dropped, policy.pending), (10, 1, 8, 1))
+        # the last held message is decoded after the interval, also without a further message
+        self.assertIsNone(policy.take_held(0.95))
+        self.assertEqual(policy.take_held(1.0).timestamp, 0.9)
+        self.assertEqual((policy.decoded, policy.pending), (2, 0))
+
+    def test_every_nth(self):
+        policy = EveryNthPolicy(3)
+
+        accepted = [policy.accept(Message(t)) for t in range(7)]
+
+        self.assertEqual(accepted, [True, False, False, True, False, False, True])
+        self.assertEqual((policy.decoded, policy.dropped), (3, 4))
+
+    def test_average(self):
+        policy = AveragePolicy(1.0)
+
+        self.assertIsNone(policy.aggregate(get_snapshot(100.0, 0.0), 0.0))
+        self.assertIsNone(policy.aggregate(get_snapshot(200.0, 0.5), 0.5))
+        snapshot = policy.aggregate(get_snapshot(600.0, 1.0), 1.0)
+
+        self.assertAlmostEqual(snapshot.power, 300.0)
+        self.assertAlmostEqual(snapshot.L1.power, 300.0)
+        self.assertAlmostEqual(snapshot.current, 300.0 / 230)
+        # the other values are the ones of the last snapshot
+        self.assertEqual(snapshot.time, 1.0)
+        self.assertEqual((policy.aggregated, policy.pending), (2, 0))
+
+    def test_average_without_further_message(self):
+        policy = AveragePolicy(1.0)
+        policy.aggregate(get_snapshot(100.0, 0.0), 0.0)
+        policy.aggregate(get_snapshot(300.0, 0.5), 0.5)
+
+        self.assertIsNone(policy.take_aggregate(0.9))
+        self.assertAlmostEqual(policy.take_aggregate(1.0).power, 200.0)
+        self.assertIsNone(policy.take_aggregate(2.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+# Usage: python -m pytest tests  or  python -m unittest discover tests
+
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from urllib.request import urlopen
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+
+from deadband import Deadband  # noqa: E402
+from ingest import EveryNthPolicy  # noqa: E402
+from metrics import MetricsServer, get_metrics  # noqa: E402
+from pvservice import PvDevice  # noqa: E402
+from reconnect import STATE_CONNECTED, Reconnector  # noqa: E402
+
+
+def get_service(device, deadband=None):
+    # the counters of DbusMqttPvService, which are exported
+    return SimpleNamespace(
+        device=device, queue_depth=2, signals=10, changes=140, publish_time=0.5, publish_time_total=5.0, deadband=deadband, timeouts=1
+    )
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.device = PvDevice("PV", 100, 'N/pv "1"\\', 1000, 0, "230", "50", "0", ingest=EveryNthPolicy(2))
+        self.waiting = PvDevice("PV 2", 101, "N/pv2", 1000, 0, "230", "50", "0")
+        self.device.received = 7
+        self.device.errors["json"] = 3
+
+    def test_labels_are_escaped(self):
+        metrics = get_metrics([self.device], [])
+
+        self.assertIn('dbus_mqtt_pv_messages_received_total{topic="N/pv \\"1\\"\\\\"} 7\n', metrics)
+        self.assertIn('dbus_mqtt_pv_parse_errors_total{topic="N/pv \\"1\\"\\\\",type="json"} 3\n', metrics)
+
+    def test_devices_without_service(self):
+        metrics = get_metrics([self.device, self.waiting], [get_service(self.device)])
+
+        self.assertIn('dbus_mqtt_pv_registered{topic="N/pv2"} 0\n', metrics)
+        self.assertIn('dbus_mqtt_pv_messages_received_total{topic="N/pv2"} 0\n', metrics)
+        self.assertIn('dbus_mqtt_pv_ingest_dropped_total{topic="N/pv2"} 0\n', metrics)
+        self.assertNotIn('dbus_mqtt_pv_queue_depth{topic="N/pv2"}', metrics)
+        self.assertIn("dbus_mqtt_pv_dbus_changes_total", metrics)
+        self.assertIn("# TYPE dbus_mqtt_pv_publish_seconds_total counter\n", metrics)
+        # only exported with a deadband
+        self.assertNotIn("deadband", metrics)
+
+    def test_deadband_reconnector_and_checkpoint(self):
+        deadband = Deadband({"power": (10.0, 0.0)})
+        deadband.accept("/Ac/Power", 100.0, 0)
+        deadband.accept("/Ac/Power", 105.0, 1)
+        reconnector = Reconnector(None)
+        reconnector.state = STATE_CONNECTED
+        reconnector.reconnects = 4
+        checkpoint = SimpleNamespace(writes=2, bytes_written=512)
+
+        metrics = get_metrics([self.waiting], [get_service(self.waiting, deadband)], reconnector, checkpoint)
+
+        self.assertIn('dbus_mqtt_pv_deadband_suppression_ratio{topic="N/pv2"} 0.5\n', metrics)
+        self.assertIn("dbus_mqtt_pv_reconnects_total 4\n", metrics)
+        self.assertIn("dbus_mqtt_pv_connected 1\n", metrics)
+        self.assertIn("dbus_mqtt_pv_checkpoint_bytes_written_total 512\n", metrics)
+
+    def test_server(self):
+        services = []
+        server = MetricsServer("127.0.0.1", 0, [self.waiting], services)
+        server.start()
+        self.addCleanup(server.stop)
+
+        # services registered later are exported too
+        services.append(get_service(self.waiting))
+        with urlopen("http://127.0.0.1:%i/metrics" % server.port, timeout=5) as response:
+            body = response.read().decode()
+
+        self.assertEqual(body, get_metrics([self.waiting], services))
+        self.assertIn('dbus_mqtt_pv_registered{topic="N/pv2"} 1\n', body)
+
+
+if __name__ == "__main__":
+    unittest.main()
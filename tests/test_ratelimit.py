@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+# Usage: python -m pytest tests  or  python -m unittest discover tests
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+
+import ratelimit  # noqa: E402
+from ratelimit import RateLimiter  # noqa: E402
+
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.time = 0.0
+        patcher = mock.patch.object(ratelimit, "monotonic", lambda: self.time)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_rate(self):
+        limiter = RateLimiter(burst=3, rate=0.1)
+
+        self.assertEqual([limiter.acquire("a") for i in range(5)], [0, 0, 0, None, None])
+        # a second key has its own bucket
+        self.assertEqual(limiter.acquire("b"), 0)
+
+        self.time = 9.0
+        self.assertIsNone(limiter.acquire("a"))
+        self.time = 20.0
+        # the next logged message tells how many were suppressed
+        self.assertEqual(limiter.acquire("a"), 3)
+        self.assertEqual(limiter.acquire("a"), 0)
+
+    def test_flush(self):
+        limiter = RateLimiter(burst=1, rate=0.1)
+        limiter.acquire("a")
+        limiter.acquire("a")
+        limiter.acquire("a")
+        limiter.acquire("b")
+
+        self.assertEqual(limiter.flush(), [])
+        self.time = 10.0
+        self.assertEqual(limiter.flush(), [("a", 2)])
+        self.assertEqual(limiter.flush(), [])
+        # the summary used the token of the bucket
+        self.assertIsNone(limiter.acquire("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
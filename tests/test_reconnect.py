@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+# Usage: python -m pytest tests  or  python -m unittest discover tests
+
+import os
+import queue
+import sys
+import unittest
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+
+from reconnect import STATE_CONNECTED, STATE_CONNECTING, STATE_RECONNECTING, Reconnector  # noqa: E402
+
+
+class Socket:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class Client:
+    """Records the calls of the Reconnector to the paho client."""
+
+    def __init__(self, socket_error=None, reconnect_error=None):
+        self.socket_error = socket_error
+        self.reconnect_error = reconnect_error
+        self.socket = Socket()
+        self.delays = []
+        self.reconnected_with = None
+
+    def reconnect_delay_set(self, min_delay, max_delay):
+        self.delays.append((min_delay, max_delay))
+
+    def _create_socket(self):
+        if self.socket_error is not None:
+            raise self.socket_error
+        return self.socket
+
+    def reconnect(self):
+        self.reconnected_with = self._create_socket()
+        if self.reconnect_error is not None:
+            raise self.reconnect_error
+
+
+class Scheduler:
+    """Collects the scheduled callbacks, like GLib.timeout_add() called from any thread."""
+
+    def __init__(self):
+        self.callbacks = queue.Queue()
+
+    def schedule(self, delay, callback):
+        self.callbacks.put((delay, callback))
+
+    def run_next(self):
+        delay, callback = self.callbacks.get(timeout=5)
+        return delay, callback()
+
+
+class BackoffTest(unittest.TestCase):
+    def test_delay_grows_up_to_the_maximum(self):
+        reconnector = Reconnector(Client(), min_delay=1, max_delay=60)
+
+        for attempts, delay in ((0, 1), (1, 2), (3, 8), (6, 60), (20, 60)):
+            reconnector.attempts = attempts
+            for i in range(50):
+                self.assertTrue(delay / 2 <= reconnector.get_delay() <= delay)
+
+    def test_states(self):
+        client = Client()
+        reconnector = Reconnector(client)
+        self.assertEqual(reconnector.state, STATE_CONNECTING)
+
+        reconnector.connected()
+        reconnector.disconnected()
+        self.assertEqual((reconnector.state, reconnector.attempts), (STATE_RECONNECTING, 0))
+        self.assertEqual(reconnector.status, "MQTT reconnecting")
+
+        # refused by the broker and not reachable
+        reconnector.disconnected()
+        reconnector.connect_failed()
+        self.assertEqual(reconnector.attempts, 2)
+        self.assertEqual(reconnector.status, "MQTT reconnecting (attempt 3)")
+
+        reconnector.connected()
+        self.assertEqual((reconnector.state, reconnector.attempts, reconnector.reconnects), (STATE_CONNECTED, 0, 1))
+        # without a schedule function paho's thread waits for the delay before every attempt
+        self.assertEqual(len(client.delays), 3)
+        self.assertTrue(all(min_delay == max_delay for min_delay, max_delay in client.delays))
+
+
+class ScheduledReconnectTest(unittest.TestCase):
+    def test_socket_is_handed_to_the_main_loop(self):
+        client = Client()
+        scheduler = Scheduler()
+        reconnector = Reconnector(client, schedule=scheduler.schedule)
+
+        reconnector.connected()
+        reconnector.disconnected()
+        delay, result = scheduler.run_next()
+        self.assertLessEqual(delay, 1)
+        self.assertFalse(result)
+        # the socket is created in a thread and the client is reconnected by the scheduled callback
+        self.assertEqual(scheduler.run_next(), (0, False))
+
+        self.assertIs(client.reconnected_with, client.socket)
+        self.assertNotIn("_create_socket", vars(client))
+        self.assertEqual(reconnector.state, STATE_RECONNECTING)
+
+    def test_failed_socket(self):
+        client = Client(socket_error=OSError("unreachable"))
+        scheduler = Scheduler()
+        reconnector = Reconnector(client, schedule=scheduler.schedule)
+        reconnector.connected()
+        reconnector.disconnected()
+
+        with self.assertLogs(level="ERROR"):
+            scheduler.run_next()
+            scheduler.run_next()
+
+        self.assertEqual(reconnector.attempts, 1)
+        # the next attempt is scheduled with the backoff
+        delay, callback = scheduler.callbacks.get(timeout=5)
+        self.assertTrue(1 <= delay <= 2)
+
+    def test_failed_reconnect_closes_the_socket(self):
+        client = Client(reconnect_error=ValueError("handshake"))
+        scheduler = Scheduler()
+        reconnector = Reconnector(client, schedule=scheduler.schedule)
+        reconnector.connected()
+        reconnector.disconnected()
+
+        with self.assertLogs(level="ERROR"):
+            scheduler.run_next()
+            scheduler.run_next()
+
+        self.assertTrue(client.socket.closed)
+        self.assertEqual(reconnector.attempts, 1)
+        self.assertNotIn("_create_socket", vars(client))
+
+
+if __name__ == "__main__":
+    unittest.main()
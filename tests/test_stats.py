@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+# Usage: python -m pytest tests  or  python -m unittest discover tests
+
+import os
+import random
+import sys
+import unittest
+from statistics import pstdev
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "dbus-mqtt-pv"))
+
+from stats import RollingPercentiles, RollingStats, get_window_name, get_windows  # noqa: E402
+
+
+class RollingStatsTest(unittest.TestCase):
+    def test_empty(self):
+        stats = RollingStats(60)
+
+        self.assertEqual(len(stats), 0)
+        self.assertEqual((stats.min, stats.max, stats.avg, stats.stddev), (None, None, None, None))
+
+    def test_against_all_samples(self):
+        rng = random.Random(1)
+        stats = RollingStats(10)
+        samples = []
+        time = 0.0
+        for i in range(2000):
+            # several samples per bucket and gaps of several buckets
+            time += rng.choice((0.05, 0.3, 1.0, 4.0))
+            value = rng.uniform(0, 5000)
+            stats.add(time, value)
+            samples.append((time, value))
+
+            # the window holds the samples of the buckets, which did not end before "time - window"
+            window = [v for t, v in samples if t // 1.0 + 1.0 > time - 10]
+            self.assertEqual(len(stats), len(window))
+            self.assertEqual(stats.min, min(window))
+            self.assertEqual(stats.max, max(window))
+            self.assertAlmostEqual(stats.avg, sum(window) / len(window), places=6)
+            self.assertAlmostEqual(stats.stddev, pstdev(window), places=4)
+
+    def test_window_keeps_its_length_at_any_rate(self):
+        stats = RollingStats(60)
+        # 100 samples per second for 120 seconds
+        for i in range(12000):
+            stats.add(i / 100, 1.0 if i < 6000 else 2.0)
+        stats.add(120.5, 2.0)
+
+        self.assertEqual(stats.min, 2.0)
+        self.assertEqual(len(stats), 6001)
+        self.assertEqual(len(stats._buckets), 60)
+
+    def test_window_names(self):
+        self.assertEqual(get_windows("1, 15,"), [60, 900])
+        self.assertEqual(get_windows("0.5"), [30])
+        self.assertEqual(get_window_name(900), "15min")
+        self.assertEqual(get_window_name(30), "30s")
+
+
+class RollingPercentilesTest(unittest.TestCase):
+    def test_empty(self):
+        self.assertEqual(RollingPercentiles().percentiles(50, 99), [None, None])
+
+    def test_percentiles_within_bucket_width(self):
+        percentiles = RollingPercentiles(size=1000, factor=1.1)
+        for value in range(1, 1001):
+            percentiles.add(float(value))
+
+        p50, p99 = percentiles.percentiles(50, 99)
+        # upper bound of the bucket, at most 10 % above the exact value
+        self.assertTrue(500 <= p50 <= 550, p50)
+        self.assertTrue(990 <= p99 <= 1089, p99)
+
+    def test_only_the_last_samples(self):
+        percentiles = RollingPercentiles(size=10)
+        for value in [1000.0] * 10 + [1.0] * 10:
+            percentiles.add(value)
+
+        self.assertEqual(len(percentiles), 10)
+        self.assertLess(percentiles.percentiles(100)[0], 1.1)
+
+    def test_out_of_range(self):
+        percentiles = RollingPercentiles(minimum=0.1, maximum=100.0)
+        percentiles.add(0.01)
+        percentiles.add(1e9)
+
+        low, high = percentiles.percentiles(50, 100)
+        self.assertEqual(low, 0.1)
+        self.assertGreaterEqual(high, 100.0)
+
+
+if __name__ == "__main__":
+    unittest.main()